@@ -0,0 +1,212 @@
+# benchmarks/bench_pipeline.py
+"""Throughput and peak-memory benchmarks for the processing pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --rows 100,10000 --save-baseline
+
+Results are written to benchmarks/results/latest.json.  When a baseline
+exists, stages whose throughput dropped by more than --tolerance are
+reported and the exit status is 1, so a release check can fail on them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from itertools import count
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from custom_components.purpleair import api, aqi, columnar
+from custom_components.purpleair.stream import SensorStreamParser
+
+from .payloads import FIELD_SETS, generate
+
+RESULTS_DIR = Path(__file__).parent / "results"
+DEFAULT_ROWS = [10, 100, 1000, 10000, 50000]
+CONVERSIONS = ["US EPA", "Woodsmoke", "AQ&U", "LRAPA", "CF=1", "none"]
+
+
+def make_client(conversion: str = "US EPA", weighted: bool = True) -> api.PurpleAirClient:
+    config = api.PurpleAirConfig(
+        api_key="benchmark",
+        device_search=True,
+        search_coords=(37.7749, -122.4194),
+        search_range=50,
+        unit="miles",
+        weighted=weighted,
+        sensor_index=None,
+        read_key=None,
+        conversion=conversion,
+        update_interval=10,
+    )
+    # No transport: the benchmark never touches the network
+    return api.PurpleAirClient(None, config)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_kib": peak / 1024}
+
+
+def stages(rows: int) -> Dict[str, Callable[[], Any]]:
+    client = make_client()
+    readings, metadata = generate(rows, FIELD_SETS["pm25"])
+    client.feed.metadata.merge(metadata, replace=True)
+    client.feed.metadata.refreshed_at = time.time()
+
+    pm_idx = readings["fields"].index("pm2.5")
+    rh_idx = readings["fields"].index("humidity")
+    pm_values = [row[pm_idx] for row in readings["data"] if row[pm_idx] is not None]
+    pairs = [(row[pm_idx], row[rh_idx]) for row in readings["data"] if row[pm_idx] is not None]
+    sensors = []
+    for key, pm, meta in zip(count(), pm_values, client.feed.metadata.sensors.values()):
+        record = api.SensorRecord(key)
+        record.pm25_conv = pm
+        record.coords = meta.coords
+        record.position_rating = meta.position_rating
+        sensors.append(record)
+
+    # A new data_time_stamp per call, or the client would skip the payload
+    # as already processed
+    stamps = count(readings["time_stamp"], 600)
+
+    def process_scalar() -> None:
+        saved = columnar.VECTOR_MIN_ROWS
+        columnar.VECTOR_MIN_ROWS = sys.maxsize
+        try:
+            client.process(dict(readings, data_time_stamp=next(stamps)))
+        finally:
+            columnar.VECTOR_MIN_ROWS = saved
+
+    def process_columns() -> None:
+        saved = columnar.VECTOR_MIN_ROWS
+        columnar.VECTOR_MIN_ROWS = 0
+        try:
+            client.process(dict(readings, data_time_stamp=next(stamps)))
+        finally:
+            columnar.VECTOR_MIN_ROWS = saved
+
+    raw = json.dumps(readings).encode()
+
+    def decode_json() -> None:
+        json.loads(raw)
+
+    def decode_stream() -> None:
+        parser = SensorStreamParser(api.PurpleAirFeed._keep_row)
+        for start in range(0, len(raw), api.STREAM_CHUNK_BYTES):
+            parser.feed(raw[start:start + api.STREAM_CHUNK_BYTES])
+        parser.close()
+
+    def conversions() -> None:
+        for conversion in CONVERSIONS:
+            for pm, rh in pairs:
+                api.apply_conversion(conversion, pm, rh)
+
+    def aqi_scalar() -> None:
+        for pm in pm_values:
+            api.get_part_2_5_aqi(pm)
+
+    def aqi_batch() -> None:
+        aqi.EPA_2012.aqi_many(pm_values)
+
+    def weighted() -> None:
+        api.sensor_average_weighted(sensors, "pm25_conv", client.config.search_coords)
+
+    result = {
+        "decode_json": decode_json,
+        "decode_stream": decode_stream,
+        "process_response": process_scalar,
+        "apply_conversion": conversions,
+        "get_part_2_5_aqi": aqi_scalar,
+        "aqi_many": aqi_batch,
+        "sensor_average_weighted": weighted,
+    }
+    if columnar.HAS_NUMPY:
+        result["process_columns"] = process_columns
+    return result
+
+
+def run(row_counts: List[int], repeat: int) -> Dict[str, Any]:
+    results = []
+    for rows in row_counts:
+        for stage, fn in stages(rows).items():
+            stats = measure(fn, repeat)
+            results.append(
+                {
+                    "stage": stage,
+                    "rows": rows,
+                    "seconds": stats["seconds"],
+                    "rows_per_sec": rows / stats["seconds"] if stats["seconds"] else None,
+                    "peak_kib": round(stats["peak_kib"], 1),
+                }
+            )
+            print(
+                f"{stage:>24} {rows:>6} rows  {stats['seconds'] * 1000:9.3f} ms  "
+                f"{stats['peak_kib']:9.1f} KiB peak"
+            )
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": columnar.np.__version__ if columnar.HAS_NUMPY else None,
+        "results": results,
+    }
+
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    before = {(r["stage"], r["rows"]): r for r in baseline.get("results", [])}
+    found = []
+    for r in current["results"]:
+        old = before.get((r["stage"], r["rows"]))
+        if not old or not old.get("rows_per_sec") or not r.get("rows_per_sec"):
+            continue
+        change = r["rows_per_sec"] / old["rows_per_sec"] - 1
+        if change < -tolerance:
+            found.append(f"{r['stage']} @ {r['rows']} rows: {change:+.0%} throughput")
+    return found
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default=",".join(str(r) for r in DEFAULT_ROWS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "latest.json")
+    parser.add_argument("--baseline", type=Path, default=RESULTS_DIR / "baseline.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = run([int(r) for r in args.rows.split(",")], args.repeat)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        return 0
+
+    if args.baseline.exists():
+        found = regressions(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
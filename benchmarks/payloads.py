@@ -0,0 +1,76 @@
+# benchmarks/payloads.py
+#
+# Synthetic /v1/sensors payloads shaped like real PurpleAir responses.
+
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from custom_components.purpleair.api import METADATA_FIELDS
+
+# Field combinations the integration actually requests
+FIELD_SETS = {
+    "pm25": ["confidence", "pm2.5", "humidity"],
+    "cf1": ["confidence", "pm2.5_cf_1", "humidity"],
+    "all": ["confidence", "pm2.5", "pm2.5_cf_1", "humidity", "pm2.5_a", "pm2.5_b"],
+}
+
+
+def generate(
+    rows: int,
+    fields: List[str],
+    origin: Tuple[float, float] = (37.7749, -122.4194),
+    spread: float = 0.5,
+    null_rate: float = 0.05,
+    low_confidence_rate: float = 0.1,
+    seed: Optional[int] = 0,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return (readings payload, metadata payload) for ``rows`` sensors.
+
+    ``spread`` is the half-width of the area in degrees.  A ``null_rate``
+    share of reading values are None and a ``low_confidence_rate`` share of
+    sensors report confidence below the 90 cut-off.
+    """
+    rnd = random.Random(seed)
+    lat0, lon0 = origin
+
+    readings: List[List[Any]] = []
+    metadata: List[List[Any]] = []
+    for i in range(rows):
+        sensor_index = 100000 + i
+        # Skewed towards clean air, with an occasional smoke plume
+        pm = rnd.lognormvariate(2.0, 0.9)
+        if rnd.random() < 0.02:
+            pm *= rnd.uniform(5, 40)
+
+        values = {
+            "confidence": rnd.randint(30, 89) if rnd.random() < low_confidence_rate else rnd.randint(90, 100),
+            "pm2.5": round(pm, 1),
+            "pm2.5_cf_1": round(pm * rnd.uniform(1.0, 1.6), 1),
+            "humidity": rnd.randint(5, 95),
+            "pm2.5_a": round(pm * rnd.uniform(0.9, 1.1), 1),
+            "pm2.5_b": round(pm * rnd.uniform(0.9, 1.1), 1),
+        }
+        row: List[Any] = [sensor_index]
+        for field in fields:
+            value = values.get(field)
+            if field != "confidence" and rnd.random() < null_rate:
+                value = None
+            row.append(value)
+        readings.append(row)
+
+        metadata.append(
+            [
+                sensor_index,
+                f"Sensor {sensor_index}",
+                lat0 + rnd.uniform(-spread, spread),
+                lon0 + rnd.uniform(-spread, spread),
+                rnd.choice([0, 1, 2, 3, 4, 5, None]),
+            ]
+        )
+
+    return (
+        {"fields": ["sensor_index"] + list(fields), "data": readings, "time_stamp": 1700000000},
+        {"fields": ["sensor_index"] + METADATA_FIELDS, "data": metadata},
+    )
@@ -3,18 +3,42 @@ from __future__ import annotations
 
 from datetime import timedelta
 import logging
+import os
+import time
 
-import aiohttp
+from aiohttp import web
+
+from homeassistant.components import persistent_notification, webhook
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONCENTRATION_MICROGRAMS_PER_CUBIC_METER
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_change, async_track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
 )
+from homeassistant.util import dt as dt_util
+from homeassistant.util.ssl import get_default_context
 
-from .api import PurpleAirClient, PurpleAirConfig
+from .api import PurpleAirClient, PurpleAirConfig, PurpleAirResult, parse_sensors
+from .backfill import BACKFILL_INTERVAL, HistoryStore, PurpleAirBackfill
+from .hub import PurpleAirHub
+from .interpolate import parse_zones
+from .lan import parse_hosts
+from .longterm import HourlyBuckets, statistic_slug
+from .offload import Offloader
+from .push import PurpleAirPushFeed
+from .scheduler import AdaptiveScheduler
+from .storage import SAVE_DELAY, STORAGE_VERSION, restore, snapshot
+from .transport import DEFAULT_POOL_SIZE, PurpleAirTransport
 
 DOMAIN = "purpleair"
+HUB = "hub"
+TRANSPORT = "transport"
+OFFLOADER = "offloader"
 PLATFORMS: list[str] = ["sensor", "number"]
 
 _LOGGER = logging.getLogger(__name__)
@@ -27,13 +51,26 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data.setdefault(DOMAIN, {})
+    hub: PurpleAirHub = hass.data[DOMAIN].setdefault(HUB, PurpleAirHub())
 
-    session = aiohttp.ClientSession(
-        connector=aiohttp.TCPConnector(ssl=False)
-    )
+    conf = entry.data
 
+    # One transport for every entry so connections to the API are reused
+    transport: PurpleAirTransport = hass.data[DOMAIN].get(TRANSPORT)
+    if transport is None:
+        if conf.get("transport", "dedicated") == "shared":
+            transport = PurpleAirTransport(async_get_clientsession(hass))
+        else:
+            transport = PurpleAirTransport.dedicated(
+                pool_size=int(conf.get("pool_size", DEFAULT_POOL_SIZE)),
+                ssl_context=get_default_context(),
+            )
+        hass.data[DOMAIN][TRANSPORT] = transport
 
-    conf = entry.data
+    # Likewise one executor for decoding/processing large responses
+    offloader: Offloader = hass.data[DOMAIN].setdefault(
+        OFFLOADER, Offloader(conf.get("offload", "thread"))
+    )
 
     coords = None
     if conf.get("device_search", True):
@@ -48,29 +85,61 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         weighted=conf.get("weighted", True),
         sensor_index=int(conf["sensor_index"]) if conf.get("sensor_index") is not None else None,
         read_key=conf.get("read_key"),
+        sensors=tuple(parse_sensors(conf.get("sensors"))),
+        zones=tuple(parse_zones(conf.get("zones"))),
+        interpolation=conf.get("interpolation", "idw"),
         conversion=conf.get("conversion", "US EPA"),
+        aqi_breakpoints=conf.get("aqi_breakpoints", "EPA 2012"),
+        all_conversions=conf.get("all_conversions", False),
+        local_hosts=tuple(parse_hosts(conf.get("local_hosts"))),
         update_interval=int(conf.get("update_interval", 10)),
+        incremental=conf.get("incremental", False),
+        nearest_count=int(conf.get("nearest_count", 0)),
+        outlier_rejection=conf.get("outlier_rejection", False),
     )
 
-    client = PurpleAirClient(session, cfg)
+    client = PurpleAirClient(transport, cfg, offloader)
+    scheduler = AdaptiveScheduler(
+        cfg.update_interval,
+        adaptive=conf.get("adaptive", False),
+        budget=int(conf.get("point_budget", 0)),
+        period=conf.get("budget_period", "day"),
+    )
   
     last_aqi: int | None = None
-    
-    async def async_update():
+
+    def track_delta(
+        data: PurpleAirResult, points: int = 0, metadata_points: int = 0
+    ) -> PurpleAirResult:
         nonlocal last_aqi
+        if data and data.aqi is not None:
+            if last_aqi is None:
+                data._aqi_delta = 0
+            else:
+                data._aqi_delta = data.aqi - last_aqi
+            last_aqi = data.aqi
+        elif data:
+            data._aqi_delta = None
+
+        coordinator.update_interval = scheduler.record(
+            data, points, dt_util.now(), metadata_points
+        )
+        return data
+
+    # Devices uploading to our webhook replace polling while they keep at it
+    push_feed: PurpleAirPushFeed | None = None
+    push_client: PurpleAirClient | None = None
+    if conf.get("push", False):
+        push_feed = PurpleAirPushFeed()
+        push_client = PurpleAirClient(transport, cfg, offloader, feed=push_feed)
+
+    async def async_update():
+        start = time.monotonic()
+        source = push_client if push_feed is not None and push_feed.active else client
         try:
-            data = await client.fetch()
-    
-            if data and data.aqi is not None:
-                if last_aqi is None:
-                    data._aqi_delta = 0
-                else:
-                    data._aqi_delta = data.aqi - last_aqi
-                last_aqi = data.aqi
-            elif data:
-                data._aqi_delta = None
-    
-            return data
+            data = await source.fetch()
+            source.last_stats.total = time.monotonic() - start
+            return track_delta(data, source.last_points, source.last_stats.metadata_points)
     
         except Exception as err:
             raise UpdateFailed(str(err)) from err
@@ -85,26 +154,202 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         update_interval=timedelta(minutes=cfg.update_interval),
     )
 
-    await coordinator.async_config_entry_first_refresh()
+    def push_result(data: PurpleAirResult) -> None:
+        coordinator.async_set_updated_data(track_delta(data))
+
+    # Results fetched on behalf of another location sharing our feed, or by
+    # background revalidation after serving stale data
+    client.on_update = push_result
+    hub.register(client, push_result)
+
+    # Start from the on-disk cache when it is recent enough and refresh in
+    # the background; otherwise the first refresh has to succeed
+    store: Store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+    cached = restore(client, await store.async_load())
+    if push_client is not None:
+        # Share the saved (and backfilled) NowCast history
+        push_client.history = client.history
+    if cached is not None:
+        last_aqi = cached.aqi
+        coordinator.async_set_updated_data(cached)
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} refresh {entry.entry_id}"
+        )
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            hub.unregister(client)
+            client.cancel()
+            raise
+
+    def save_cache() -> None:
+        store.async_delay_save(lambda: snapshot(client), SAVE_DELAY)
+
+    entry.async_on_unload(coordinator.async_add_listener(save_cache))
+
+    if push_feed is not None:
+        _register_webhook(hass, entry, push_feed, push_client, push_result)
+
+    # Per-sensor hourly statistics, imported in one batch shortly after each hour
+    if conf.get("sensor_statistics", False):
+        buckets = HourlyBuckets()
+        client.buckets = buckets
+        if push_client is not None:
+            push_client.buckets = buckets
+
+        # A callback, so the flush and the recorder call stay on the event loop
+        @callback
+        def import_statistics(_now=None) -> None:
+            _async_import_statistics(hass, buckets, cfg.conversion)
+
+        entry.async_on_unload(async_track_time_change(hass, import_statistics, minute=1, second=0))
+        entry.async_on_unload(import_statistics)
+
+    # Hourly history of the contributing sensors, topped up once a day
+    history: HistoryStore | None = None
+    backfill_days = int(conf.get("backfill_days", 0))
+    if backfill_days and not cfg.local_hosts:
+        history = await hass.async_add_executor_job(HistoryStore, _history_path(hass, entry))
+        backfill = PurpleAirBackfill(transport, cfg.api_key, history, backfill_days)
+
+        async def run_backfill(_now=None) -> None:
+            await backfill.async_run(client)
+
+        entry.async_create_background_task(
+            hass, run_backfill(), f"{DOMAIN} backfill {entry.entry_id}"
+        )
+        entry.async_on_unload(
+            async_track_time_interval(hass, run_backfill, timedelta(seconds=BACKFILL_INTERVAL))
+        )
 
     hass.data[DOMAIN][entry.entry_id] = {
-        "session": session,
+        "transport": transport,
         "coordinator": coordinator,
         "config": cfg,
+        "client": client,
+        "scheduler": scheduler,
+        "store": store,
+        "push": push_feed,
+        "history": history,
     }
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+def _register_webhook(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    feed: PurpleAirPushFeed,
+    client: PurpleAirClient,
+    push_result,
+) -> None:
+    """Receive device uploads at /api/webhook/<id>, created on first use."""
+    webhook_id = entry.data.get("webhook_id")
+    if not webhook_id:
+        webhook_id = webhook.async_generate_id()
+        hass.config_entries.async_update_entry(entry, data={**entry.data, "webhook_id": webhook_id})
+        persistent_notification.async_create(
+            hass,
+            "Set each device's custom data processor (Registration page, "
+            f"server {webhook.async_generate_url(hass, webhook_id)}) to push readings "
+            "to Home Assistant.",
+            title=f"{entry.title}: push endpoint",
+            notification_id=f"{DOMAIN}_{entry.entry_id}_push",
+        )
+
+    async def handle_upload(hass: HomeAssistant, webhook_id: str, request: web.Request):
+        try:
+            payload = feed.accept(await request.json(), request.remote or "push")
+        except ValueError as err:
+            _LOGGER.debug("Rejected PurpleAir upload from %s: %s", request.remote, err)
+            return web.Response(status=400)
+        try:
+            result = await client.async_process(payload)
+        except RuntimeError as err:
+            # e.g. every pushing device is outside the search area
+            _LOGGER.debug("PurpleAir upload not usable: %s", err)
+            return web.Response(status=422)
+        push_result(result)
+        return web.Response(status=200)
+
+    webhook.async_register(
+        hass, DOMAIN, entry.title, webhook_id, handle_upload, allowed_methods=["POST"]
+    )
+    entry.async_on_unload(lambda: webhook.async_unregister(hass, webhook_id))
+
+
+def _async_import_statistics(
+    hass: HomeAssistant, buckets: HourlyBuckets, conversion: str
+) -> None:
+    """Write every completed hour as external statistics, one series per sensor."""
+    closed = buckets.flush(time.time())
+    if not closed:
+        return
+    # Imported here so the recorder is only needed when the option is on
+    from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+    for key, hours in closed.items():
+        metadata = {
+            "has_mean": True,
+            "has_sum": False,
+            "name": f"{buckets.names.get(key, key)} PM2.5 ({conversion})",
+            "source": DOMAIN,
+            "statistic_id": f"{DOMAIN}:pm25_{statistic_slug(key)}",
+            "unit_of_measurement": CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
+        }
+        try:
+            async_add_external_statistics(
+                hass,
+                metadata,
+                [
+                    {
+                        "start": dt_util.utc_from_timestamp(hour * 3600),
+                        "mean": mean,
+                        "min": low,
+                        "max": high,
+                    }
+                    for hour, mean, low, high in hours
+                ],
+            )
+        except HomeAssistantError as err:  # one bad series must not drop the rest
+            _LOGGER.warning("Could not import PurpleAir statistics for %s: %s", key, err)
+    _LOGGER.debug("Imported PurpleAir statistics for %d sensors", len(closed))
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
+    hub: PurpleAirHub = hass.data[DOMAIN][HUB]
     data = hass.data[DOMAIN].pop(entry.entry_id, None)
-    if data and data.get("session"):
-        await data["session"].close()
+    if data:
+        hub.unregister(data["client"])
+        data["client"].cancel()
+        # Write now rather than leaving a delayed save behind
+        await data["store"].async_save(snapshot(data["client"]))
+        if data["history"] is not None:
+            await hass.async_add_executor_job(data["history"].close)
 
-    if not hass.data[DOMAIN]:
+    if not hub.clients:
+        await hass.data[DOMAIN][TRANSPORT].close()
+        await hass.async_add_executor_job(hass.data[DOMAIN][OFFLOADER].shutdown)
         hass.data.pop(DOMAIN)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
+
+    def remove_history() -> None:
+        path = _history_path(hass, entry)
+        for name in (path, f"{path}-wal", f"{path}-shm"):
+            if os.path.exists(name):
+                os.remove(name)
+
+    await hass.async_add_executor_job(remove_history)
+
+
+def _history_path(hass: HomeAssistant, entry: ConfigEntry) -> str:
+    return hass.config.path(f"{DOMAIN}_{entry.entry_id}_history.db")
@@ -3,14 +3,86 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import math
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from itertools import compress
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 
+from . import columnar
+from .aqi import BREAKPOINTS, EPA_2012, Breakpoints, category_for
+from .interpolate import Zone, ZoneInterpolator
+from .longterm import HourlyBuckets
+from .nowcast import NowCastHistory
+from .offload import Offloader
+from .resilience import (
+    MAX_ATTEMPTS,
+    RETRY_AFTER_MAX,
+    CircuitBreaker,
+    PurpleAirError,
+    PurpleAirHTTPError,
+    backoff_delay,
+    is_permanent,
+    parse_retry_after,
+)
+from .spatial import SensorGrid, distance, distance2degrees
+from .stream import SensorStreamParser
+from .transport import PurpleAirTransport, RequestTiming
+
+_LOGGER = logging.getLogger(__name__)
+
 BASE_URL = "https://api.purpleair.com/v1/sensors"
 
+# Fields that practically never change; fetched by MetadataCache, not per poll
+METADATA_FIELDS = ["name", "latitude", "longitude", "position_rating"]
+
+# PurpleAir bills a small amount per call plus points per field per returned
+# sensor.  These figures are only used to estimate spend for budgeting.
+POINTS_PER_CALL = 1
+POINTS_PER_FIELD = 1
+
+# Failures worth retrying, serving stale data for, and counting against the breaker
+TRANSIENT_ERRORS = (PurpleAirError, aiohttp.ClientError, asyncio.TimeoutError)
+
+# How long a last good result may be served (marked stale) while the API is down
+MAX_STALE_SECONDS = 3600
+
+# Sensors below this confidence are never averaged
+MIN_CONFIDENCE = 90
+
+# Outlier rejection.  A sensor's A and B channels disagree when they differ
+# by more than AB_MAX_DIFF µg/m³ *and* AB_MAX_RPD relative percent difference
+# (the EPA's PurpleAir QA rule).  Across sensors, a modified z-score
+# (MAD_SCALE * |x - median| / MAD) above MAD_CUTOFF marks an outlier; it is
+# only applied with at least MAD_MIN_SENSORS sensors.
+AB_MAX_DIFF = 5.0
+AB_MAX_RPD = 0.7
+MAD_SCALE = 0.6745
+MAD_CUTOFF = 3.5
+MAD_MIN_SENSORS = 3
+
+# The PM2.5 field each conversion is defined on
+CONVERSION_FIELDS = {
+    "US EPA": "pm2.5",
+    "Woodsmoke": "pm2.5_cf_1",
+    "AQ&U": "pm2.5",
+    "LRAPA": "pm2.5_cf_1",
+    "CF=1": "pm2.5_cf_1",
+    "none": "pm2.5",
+}
+
+# Read size when parsing a response as it streams in
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Direct mode: sensors per show_only request, and requests in flight at once
+MAX_SHOW_ONLY = 100
+MAX_PARALLEL_BATCHES = 4
+
 
 @dataclass
 class PurpleAirConfig:
@@ -24,6 +96,15 @@ class PurpleAirConfig:
     read_key: Optional[str]
     conversion: str  # "US EPA", "Woodsmoke", "AQ&U", "LRAPA", "CF=1", "none"
     update_interval: int  # minutes
+    incremental: bool = False  # poll with modified_since against a local SensorTable
+    nearest_count: int = 0  # average only the K closest healthy sensors (0 = all in range)
+    outlier_rejection: bool = False  # A/B channel check plus median/MAD filter
+    aqi_breakpoints: str = "EPA 2012"  # key of aqi.BREAKPOINTS
+    all_conversions: bool = False  # also compute the AQI under every conversion
+    local_hosts: Tuple[str, ...] = ()  # poll these devices on the LAN instead of the API
+    sensors: Tuple[Tuple[int, Optional[str]], ...] = ()  # direct mode: (index, read key) pairs
+    zones: Tuple[Zone, ...] = ()  # points of interest to interpolate an AQI for
+    interpolation: str = "idw"  # "idw" or "kriging"
 
 
 @dataclass
@@ -33,102 +114,963 @@ class PurpleAirResult:
     sites: List[str]
     conversion: str
     weighted: bool
+    stale: bool = False  # served from cache while the API is failing
+    nowcast_aqi: Optional[int] = None  # 12-hour EPA NowCast; None until enough history
+    dropped: List[str] = field(default_factory=list)  # sites rejected as outliers
+    conversions: Dict[str, int] = field(default_factory=dict)  # AQI per conversion name
+    zones: Dict[str, int] = field(default_factory=dict)  # interpolated AQI per zone name
 
 
-class PurpleAirClient:
-    def __init__(self, session: aiohttp.ClientSession, config: PurpleAirConfig) -> None:
-        self._session = session
-        self._config = config
+@dataclass
+class PollStats:
+    """Where the time (seconds), bytes and rows of one poll went.
+
+    Network phases are summed over every request in the poll (readings plus
+    any metadata refresh).  ``dns`` and ``connect`` stay 0 on reused
+    connections, and phase detail needs the dedicated transport.
+    """
+
+    requests: int = 0
+    dns: float = 0.0
+    connect: float = 0.0  # TCP + TLS
+    server_wait: float = 0.0  # request sent → response headers
+    transfer: float = 0.0  # remainder of the request, mostly reading the body
+    decode: float = 0.0  # JSON decoding
+    process: float = 0.0  # row selection, conversion and averaging
+    total: float = 0.0  # whole coordinator update
+    bytes: int = 0
+    rows_received: int = 0
+    rows_in_range: int = 0
+    rows_used: int = 0
+    points: int = 0
+    reused: int = 0  # requests sent over a pooled keep-alive connection
+    encoding: Optional[str] = None  # Content-Encoding of the last response
+    metadata_points: int = 0  # the part of ``points`` spent on metadata requests
+
+    def add_request(
+        self,
+        timing: RequestTiming,
+        decode: float,
+        size: int,
+        points: int,
+        streamed: bool = False,
+        metadata: bool = False,
+    ) -> None:
+        self.requests += 1
+        # aiohttp resolves DNS inside connection setup, so connect includes dns
+        self.dns += timing.dns or 0.0
+        self.connect += max((timing.connect or 0.0) - (timing.dns or 0.0), 0.0)
+        self.server_wait += timing.ttfb or 0.0
+        # A streamed body is decoded while it is read; keep the two apart
+        overlap = decode if streamed else 0.0
+        self.transfer += max(
+            timing.total - (timing.ttfb or 0.0) - (timing.connect or 0.0) - overlap, 0.0
+        )
+        self.decode += decode
+        self.bytes += size
+        self.points += points
+        self.reused += timing.reused
+        self.encoding = timing.encoding
+        if metadata:
+            self.metadata_points += points
+
+
+class SensorTable:
+    """Last known row for every sensor seen by an incremental feed.
+
+    PurpleAir only returns sensors modified since ``modified_since``, so the
+    full picture is the union of every response so far.  Rows are keyed by
+    ``sensor_index`` and age out once they are older than ``max_age``.
+    """
+
+    def __init__(self, max_age: int) -> None:
+        self.max_age = max_age
+        self.fields: List[str] = []
+        self.rows: Dict[int, List[Any]] = {}
+        self.stamps: Dict[int, float] = {}
+        self.time_stamp: Optional[float] = None
+        self.last_full: float = 0.0
+
+    def clear(self) -> None:
+        self.fields = []
+        self.rows.clear()
+        self.stamps.clear()
+        self.time_stamp = None
+
+    def merge(self, payload: Dict[str, Any]) -> int:
+        """Merge a (partial) response and return the number of changed rows."""
+        fields = payload.get("fields", [])
+        if fields != self.fields:
+            self.clear()
+            self.fields = list(fields)
+
+        stamp = payload.get("time_stamp") or payload.get("data_time_stamp") or time.time()
+        idx = fields.index("sensor_index") if "sensor_index" in fields else None
+        data = payload.get("data", [])
+        for row in data:
+            key = row[idx] if idx is not None else id(row)
+            self.rows[key] = row
+            self.stamps[key] = stamp
+        # Rows a streaming parse filtered out replace whatever we had for them
+        for key in payload.get("dropped", []):
+            self.rows.pop(key, None)
+            self.stamps.pop(key, None)
+
+        self.time_stamp = stamp
+        self.expire(stamp)
+        return len(data) + len(payload.get("dropped", []))
+
+    def expire(self, now: float) -> None:
+        cutoff = now - self.max_age
+        for key in [k for k, seen in self.stamps.items() if seen < cutoff]:
+            del self.rows[key]
+            del self.stamps[key]
+
+    def payload(self) -> Dict[str, Any]:
+        return {
+            "fields": self.fields,
+            "data": list(self.rows.values()),
+            "time_stamp": self.time_stamp,
+        }
 
-    async def fetch(self) -> PurpleAirResult:
-        pm25_field = self._determine_pm25_field()
-        fields = ["name", "confidence", pm25_field]
 
-        # For US EPA conversion we need humidity; we’ll always ask for it to keep the option usable
-        fields.append("humidity")
+@dataclass
+class SensorMetadata:
+    name: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    position_rating: int
 
-        if self._config.weighted:
-            fields += ["latitude", "longitude", "position_rating"]
+    @property
+    def coords(self) -> Optional[Tuple[float, float]]:
+        if self.latitude is None or self.longitude is None:
+            return None
+        return (self.latitude, self.longitude)
 
-        params = self._build_query(fields)
 
-        headers = {"X-API-Key": self._config.api_key}
+@dataclass
+class MetadataColumns:
+    """The MetadataCache laid out for the columnar path.
+
+    ``position`` maps a sensor index to its entry in the other columns.
+    ``ratings`` has one extra trailing -1, so a position of -1 (not cached)
+    picks that default.
+    """
+
+    position: Dict[Any, int]
+    names: List[str]
+    coords: List[Optional[Tuple[float, float]]]
+    ratings: Any  # np.ndarray
+
+
+class SensorRecord:
+    """One sensor's reading as used by the scalar processing path.
+
+    A client keeps a record per sensor and overwrites it on every poll in
+    which the sensor reports, so steady polling allocates nothing per row.
+    ``value`` is scratch space for whichever quantity is being averaged
+    (a conversion, a NowCast concentration).
+    """
+
+    __slots__ = (
+        "key",
+        "site",
+        "pm25",
+        "pm25_a",
+        "pm25_b",
+        "pm25_conv",
+        "humidity",
+        "raw",
+        "confidence",
+        "coords",
+        "distance",
+        "position_rating",
+        "value",
+        "seen",
+    )
+
+    def __init__(self, key: Any) -> None:
+        self.key = key
+        self.site = ""
+        self.pm25 = 0.0
+        self.pm25_a: Optional[float] = None
+        self.pm25_b: Optional[float] = None
+        self.pm25_conv = 0.0
+        self.humidity: Optional[float] = None
+        self.raw: Dict[str, float] = {}  # source field -> reading, for all_conversions
+        self.confidence = 0
+        self.coords: Optional[Tuple[float, float]] = None
+        self.distance: Optional[float] = None
+        self.position_rating = -1
+        self.value = 0.0
+        self.seen = 0  # poll number that last filled the record
+
+
+class MetadataCache:
+    """Static sensor details keyed by ``sensor_index``.
+
+    Refreshed in full every REFRESH_SECONDS, and on demand for any index a
+    poll returns that we have not seen yet.  ``version`` changes whenever
+    entries are replaced so that derived values (distances) can be dropped.
+    """
+
+    REFRESH_SECONDS = 24 * 3600
+
+    def __init__(self) -> None:
+        self.sensors: Dict[int, SensorMetadata] = {}
+        self.refreshed_at: float = 0.0
+        self.version = 0
+        self._grid: Optional[SensorGrid] = None
+        self._grid_version = -1
+        self._columns: Optional[MetadataColumns] = None
+        self._columns_version = -1
+
+    def get(self, sensor_index: Any) -> Optional[SensorMetadata]:
+        return self.sensors.get(sensor_index)
+
+    def stale(self, now: float) -> bool:
+        return now - self.refreshed_at >= self.REFRESH_SECONDS
+
+    def grid(self) -> SensorGrid:
+        """Spatial index over the cached coordinates, rebuilt per version."""
+        if self._grid is None or self._grid_version != self.version:
+            self._grid = SensorGrid(
+                {key: meta.coords for key, meta in self.sensors.items() if meta.coords is not None}
+            )
+            self._grid_version = self.version
+        return self._grid
+
+    def columns(self) -> MetadataColumns:
+        """The cache as columns, rebuilt per version; needs NumPy."""
+        if self._columns is None or self._columns_version != self.version:
+            metas = list(self.sensors.values())
+            self._columns = MetadataColumns(
+                position={key: pos for pos, key in enumerate(self.sensors)},
+                names=[meta.name for meta in metas],
+                coords=[meta.coords for meta in metas],
+                ratings=columnar.np.array(
+                    [meta.position_rating for meta in metas] + [-1], dtype=float
+                ),
+            )
+            self._columns_version = self.version
+        return self._columns
+
+    def missing(self, indices: List[Any]) -> List[Any]:
+        return [i for i in indices if i is not None and i not in self.sensors]
+
+    def absorb(self, other: "MetadataCache") -> None:
+        """Take over another cache's entries, e.g. when feeds are regrouped."""
+        if other is self or not other.sensors:
+            return
+        if self.sensors:
+            self.refreshed_at = min(self.refreshed_at, other.refreshed_at)
+        else:
+            self.refreshed_at = other.refreshed_at
+        self.sensors.update(other.sensors)
+        self.version += 1
+
+    def payload(self) -> Dict[str, Any]:
+        """The cache as a /v1/sensors-style payload that merge() accepts."""
+        return {
+            "fields": ["sensor_index", *METADATA_FIELDS],
+            "data": [
+                [key, meta.name, meta.latitude, meta.longitude, meta.position_rating]
+                for key, meta in self.sensors.items()
+            ],
+        }
 
-        async with self._session.get(
-            BASE_URL, headers=headers, params=params, timeout=30
+    def merge(self, payload: Dict[str, Any], replace: bool = False) -> None:
+        fields = payload.get("fields", [])
+        field_index = {name: idx for idx, name in enumerate(fields)}
+        if replace:
+            self.sensors.clear()
+
+        def value(row: List[Any], field: str) -> Any:
+            idx = field_index.get(field)
+            return row[idx] if idx is not None else None
+
+        for row in payload.get("data", []):
+            sensor_index = value(row, "sensor_index")
+            lat = value(row, "latitude")
+            lon = value(row, "longitude")
+            rating = value(row, "position_rating")
+            name = value(row, "name")
+            self.sensors[sensor_index] = SensorMetadata(
+                name=name if name is not None else str(sensor_index),
+                latitude=float(lat) if lat is not None else None,
+                longitude=float(lon) if lon is not None else None,
+                position_rating=int(rating) if rating is not None else -1,
+            )
+        self.version += 1
+
+
+class PurpleAirFeedBase:
+    """Readings shared by one or more clients, one poll at a time.
+
+    Concurrent callers await the same in-flight poll, and listeners are told
+    about every payload so that other clients on the feed can be updated
+    without polling themselves.  Subclasses implement ``_poll()`` and add
+    their requests to ``self._stats``.
+    """
+
+    def __init__(self) -> None:
+        self.metadata = MetadataCache()
+        # Stats (incl. estimated API points) of the most recent poll, and who asked for it
+        self.last_stats = PollStats()
+        self.last_requester: Any = None
+        self.breaker = CircuitBreaker()
+        self._stats = PollStats()
+        self._inflight: Optional[asyncio.Future] = None
+        self._listeners: List[Callable[[Dict[str, Any], Any], None]] = []
+
+    @property
+    def last_points(self) -> int:
+        return self.last_stats.points
+
+    def add_listener(self, listener: Callable[[Dict[str, Any], Any], None]) -> None:
+        self._listeners.append(listener)
+
+    async def async_fetch(self, requester: Any = None) -> Dict[str, Any]:
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._poll())
+            inflight = self._inflight
+            self._stats = PollStats()
+            try:
+                payload = await inflight
+            finally:
+                self._inflight = None
+                self.last_stats = self._stats
+                self.last_requester = requester
+            for listener in list(self._listeners):
+                listener(payload, requester)
+            return payload
+
+        return await asyncio.shield(self._inflight)
+
+    async def _poll(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class PurpleAirFeed(PurpleAirFeedBase):
+    """A single upstream /v1/sensors query, shared by one or more clients.
+
+    An incremental feed sends ``modified_since`` after the first poll and
+    merges the changed rows into a SensorTable, with a full resync every
+    FULL_RESYNC_SECONDS to pick up sensors that left the box.
+
+    Polls only carry readings; names, coordinates and position ratings come
+    from the feed's MetadataCache, which makes its own (rare) requests.
+
+    Each request is retried with jittered exponential backoff on 429/5xx and
+    network errors (honouring Retry-After), and a CircuitBreaker stops the
+    feed from hammering the API once whole polls keep failing.
+
+    With a streaming offloader, bodies are parsed as they arrive and readings
+    rows below MIN_CONFIDENCE are dropped on the spot, so peak memory follows
+    the usable rows rather than the size of the response.
+    """
+
+    FULL_RESYNC_SECONDS = 6 * 3600
+
+    def __init__(
+        self,
+        transport: PurpleAirTransport,
+        api_key: str,
+        params: Dict[str, Any],
+        incremental: bool = False,
+        offloader: Optional[Offloader] = None,
+    ) -> None:
+        super().__init__()
+        self._transport = transport
+        self._api_key = api_key
+        self._offloader = offloader or Offloader("off")
+        self.params = params
+        self.table: Optional[SensorTable] = (
+            SensorTable(int(params.get("max_age", 3600))) if incremental else None
+        )
+
+    async def _poll(self) -> Dict[str, Any]:
+        self.breaker.check()
+        try:
+            payload = await self._poll_readings()
+            await self._refresh_metadata(payload)
+        except PurpleAirHTTPError as err:
+            if err.retryable:
+                self.breaker.failure(err.retry_after)
+            raise
+        except TRANSIENT_ERRORS:
+            self.breaker.failure()
+            raise
+        self.breaker.success()
+        return payload
+
+    async def _refresh_metadata(self, payload: Dict[str, Any]) -> None:
+        now = time.time()
+        if self.metadata.stale(now):
+            params = {**self.params, "fields": ",".join(METADATA_FIELDS)}
+            params.pop("modified_since", None)
+            self.metadata.merge(await self._request(params, metadata=True), replace=True)
+            self.metadata.refreshed_at = now
+            return
+
+        fields = payload.get("fields", [])
+        if "sensor_index" not in fields:
+            return
+        idx = fields.index("sensor_index")
+        unknown = self.metadata.missing([row[idx] for row in payload.get("data", [])])
+        if not unknown:
+            return
+
+        params = {
+            "fields": ",".join(METADATA_FIELDS),
+            "show_only": ",".join(str(i) for i in unknown),
+        }
+        if "read_key" in self.params:
+            params["read_key"] = self.params["read_key"]
+        self.metadata.merge(await self._request(params, metadata=True))
+
+    async def _poll_readings(self) -> Dict[str, Any]:
+        table = self.table
+        if table is None:
+            return await self._request(self.params, keep=self._keep_row)
+
+        now = time.time()
+        params = dict(self.params)
+        if table.time_stamp is not None and now - table.last_full < self.FULL_RESYNC_SECONDS:
+            params["modified_since"] = int(table.time_stamp)
+        else:
+            table.clear()
+            table.last_full = now
+
+        table.merge(await self._request(params, keep=self._keep_row))
+        return table.payload()
+
+    @staticmethod
+    def _keep_row(field_index: Dict[str, int], row: List[Any]) -> bool:
+        """Streaming filter: the rows every client would discard anyway."""
+        idx = field_index.get("confidence")
+        return idx is None or (row[idx] is not None and int(row[idx]) >= MIN_CONFIDENCE)
+
+    async def _request(
+        self,
+        params: Dict[str, Any],
+        keep: Optional[Callable[..., bool]] = None,
+        metadata: bool = False,
+    ) -> Dict[str, Any]:
+        for attempt in range(MAX_ATTEMPTS):
+            timing = RequestTiming()
+            parser = SensorStreamParser(keep) if self._offloader.streaming else None
+            try:
+                raw = await self._request_once(params, timing, parser)
+            except PurpleAirHTTPError as err:
+                if not err.retryable or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                if err.retry_after is not None and err.retry_after > RETRY_AFTER_MAX:
+                    raise
+                delay = err.retry_after if err.retry_after is not None else backoff_delay(attempt)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                delay = backoff_delay(attempt)
+                _LOGGER.debug("PurpleAir request failed (%s), retrying", err)
+            else:
+                if parser is not None:
+                    start = time.perf_counter()
+                    payload = parser.close()
+                    decode = parser.elapsed + time.perf_counter() - start
+                    self._stats.add_request(
+                        timing,
+                        decode,
+                        parser.size,
+                        estimate_points(payload),
+                        streamed=True,
+                        metadata=metadata,
+                    )
+                    return payload
+
+                start = time.perf_counter()
+                payload = await self._offloader.decode(raw)
+                decode = time.perf_counter() - start
+                self._stats.add_request(
+                    timing, decode, len(raw), estimate_points(payload), metadata=metadata
+                )
+                return payload
+
+            await asyncio.sleep(delay)
+
+        raise PurpleAirError("PurpleAir request retries exhausted")
+
+    async def _request_once(
+        self,
+        params: Dict[str, Any],
+        timing: RequestTiming,
+        parser: Optional[SensorStreamParser] = None,
+    ) -> bytes:
+        """Return the raw body, or feed it to ``parser`` as it arrives.
+
+        Decoding is timed separately by _request.
+        """
+        headers = {"X-API-Key": self._api_key}
+
+        async with self._transport.get(
+            BASE_URL, headers=headers, params=params, timeout=30, timing=timing
         ) as resp:
             if resp.status != 200:
-                # Simplified error; you can add backoff logic if you want to be fancy
                 text = await resp.text()
-                raise RuntimeError(f"PurpleAir HTTP {resp.status}: {text}")
+                raise PurpleAirHTTPError(
+                    resp.status, text, parse_retry_after(resp.headers.get("Retry-After"))
+                )
+
+            if parser is None:
+                return await resp.read()
+
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_BYTES):
+                parser.feed(chunk)
+            return b""
+
+
+class PurpleAirBatchFeed(PurpleAirFeed):
+    """Direct mode over a list of sensors that need different read keys.
+
+    The API takes one read key per request, so each batch from
+    direct_batches() is its own show_only request.  Batches run
+    concurrently, at most MAX_PARALLEL_BATCHES at a time, and their rows are
+    merged into one payload, so a poll of the whole list takes one
+    round-trip.  A batch that fails (e.g. a revoked read key) is left out
+    of that poll; the poll only fails when every batch does.
+    """
+
+    def __init__(
+        self,
+        transport: PurpleAirTransport,
+        api_key: str,
+        batches: List[Dict[str, Any]],
+        offloader: Optional[Offloader] = None,
+    ) -> None:
+        summary = {
+            "fields": batches[0]["fields"],
+            "show_only": ",".join(b["show_only"] for b in batches),
+        }
+        super().__init__(transport, api_key, summary, offloader=offloader)
+        self.batches = batches
+        self._semaphore = asyncio.Semaphore(MAX_PARALLEL_BATCHES)
+
+    async def _poll_readings(self) -> Dict[str, Any]:
+        return await self._request_batches(self.batches, keep=self._keep_row)
+
+    async def _refresh_metadata(self, payload: Dict[str, Any]) -> None:
+        fields = ",".join(METADATA_FIELDS)
+        now = time.time()
+        if self.metadata.stale(now):
+            batches = [{**b, "fields": fields} for b in self.batches]
+            self.metadata.merge(await self._request_batches(batches, metadata=True), replace=True)
+            self.metadata.refreshed_at = now
+            return
+
+        if "sensor_index" not in payload.get("fields", []):
+            return
+        idx = payload["fields"].index("sensor_index")
+        unknown = {str(i) for i in self.metadata.missing([row[idx] for row in payload.get("data", [])])}
+        batches = []
+        for batch in self.batches:
+            indices = [i for i in batch["show_only"].split(",") if i in unknown]
+            if indices:
+                batches.append({**batch, "fields": fields, "show_only": ",".join(indices)})
+        if batches:
+            self.metadata.merge(await self._request_batches(batches, metadata=True))
+
+    async def _request_batches(
+        self,
+        batches: List[Dict[str, Any]],
+        keep: Optional[Callable[..., bool]] = None,
+        metadata: bool = False,
+    ) -> Dict[str, Any]:
+        async def request(params: Dict[str, Any]) -> Dict[str, Any]:
+            async with self._semaphore:
+                return await self._request(params, keep=keep, metadata=metadata)
+
+        results = await asyncio.gather(*(request(b) for b in batches), return_exceptions=True)
+        payloads = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, TRANSIENT_ERRORS) or len(batches) == 1:
+                    raise result
+                _LOGGER.debug("PurpleAir batch %s failed: %s", batch["show_only"], result)
+                continue
+            payloads.append(result)
+        if not payloads:
+            raise results[0]
+        return merge_payloads(payloads)
+
+
+class PurpleAirClient:
+    """Per-location view of a feed.
+
+    When a poll fails for transient reasons the last good result is returned
+    again, marked stale, and a background task keeps revalidating; fresh
+    results from it are handed to ``on_update``.
+
+    Every processed payload also feeds the per-sensor NowCastHistory, from
+    which the NowCast AQI is averaged like the instantaneous one.
+    """
+
+    def __init__(
+        self,
+        transport: PurpleAirTransport,
+        config: PurpleAirConfig,
+        offloader: Optional[Offloader] = None,
+        feed: Any = None,
+    ) -> None:
+        self._transport = transport
+        self._config = config
+        self.offloader = offloader or Offloader("off")
+        self.pm25_field = self._determine_pm25_field()
+        # Resolved once here rather than per sensor
+        self.convert = resolve_conversion(config.conversion)
+        self.convert_column = resolve_column_conversion(config.conversion)
+        self.breakpoints: Breakpoints = BREAKPOINTS.get(config.aqi_breakpoints, EPA_2012)
+        self.fields = self._determine_fields()
+        # Any object with the feed interface, e.g. the webhook's push feed
+        self.feed = feed if feed is not None else self.make_feed()
+        self.last_stats = PollStats()
+        self.on_update: Optional[Callable[[PurpleAirResult], None]] = None
+        self._last_good: Optional[PurpleAirResult] = None
+        self._last_good_at = 0.0  # time.monotonic()
+        self._revalidate_task: Optional[asyncio.Task] = None
+        # Distance from our origin to each sensor, valid for one metadata version
+        self._distances: Dict[Any, float] = {}
+        self._distances_version: Optional[Tuple[int, int]] = None
+        self._distance_array: Any = None  # np.ndarray, see _distance_column()
+        self._in_range: Dict[Any, float] = {}
+        self.history = NowCastHistory()
+        self.zones: Optional[ZoneInterpolator] = (
+            ZoneInterpolator(list(config.zones), config.interpolation) if config.zones else None
+        )
+        # Per-sensor hourly statistics, when long-term statistics are on
+        self.buckets: Optional[HourlyBuckets] = None
+        # Scalar-path records, reused from poll to poll
+        self._records: Dict[Any, SensorRecord] = {}
+        self._poll = 0
+        # process() may run on several offloader threads at once
+        self._process_lock = threading.Lock()
+        self._processed_stamp: Optional[float] = None
+
+    @property
+    def config(self) -> PurpleAirConfig:
+        return self._config
+
+    @property
+    def transport(self) -> PurpleAirTransport:
+        return self._transport
+
+    def make_feed(self) -> PurpleAirFeed:
+        """Build a feed serving only this client."""
+        if self._config.local_hosts:
+            from .lan import PurpleAirLanFeed  # lan builds on this module
+
+            return PurpleAirLanFeed(self._transport, list(self._config.local_hosts))
+
+        if self.bounding_box() is None:
+            batches = direct_batches(self.fields, self.direct_sensors())
+            if len(batches) > 1:
+                return PurpleAirBatchFeed(
+                    self._transport, self._config.api_key, batches, offloader=self.offloader
+                )
+
+        return PurpleAirFeed(
+            self._transport,
+            self._config.api_key,
+            self._build_query(self.fields),
+            incremental=self._config.incremental,
+            offloader=self.offloader,
+        )
 
-            data = await resp.json()
+    async def fetch(self) -> PurpleAirResult:
+        try:
+            return await self._fetch_fresh()
+        except TRANSIENT_ERRORS as err:
+            self.last_stats = PollStats()
+            if is_permanent(err):
+                raise  # e.g. a revoked key; retrying cannot help
+            if self._last_good is None or time.monotonic() - self._last_good_at > MAX_STALE_SECONDS:
+                raise
+            _LOGGER.debug("Serving stale PurpleAir data: %s", err)
+            self._schedule_revalidate()
+            return replace(self._last_good, stale=True)
+
+    async def _fetch_fresh(self) -> PurpleAirResult:
+        payload = await self.feed.async_fetch(self)
+        return await self.async_process(payload)
+
+    async def async_process(self, payload: Dict[str, Any]) -> PurpleAirResult:
+        """process(), on the offloader's thread pool when the response was large."""
+        return await self.offloader.call(self.feed.last_stats.bytes, self.process, payload)
+
+    def _schedule_revalidate(self) -> None:
+        if self._revalidate_task is None or self._revalidate_task.done():
+            self._revalidate_task = asyncio.ensure_future(self._revalidate())
+
+    async def _revalidate(self) -> None:
+        attempt = 0
+        while self._last_good is not None:
+            # Never sooner than the breaker's cooldown, so the loop adds at
+            # most one request a minute on top of the scheduled updates
+            breaker = self.feed.breaker
+            await asyncio.sleep(
+                max(breaker.retry_in(), breaker.base_cooldown + backoff_delay(attempt))
+            )
+            try:
+                result = await self._fetch_fresh()
+            except TRANSIENT_ERRORS as err:
+                if is_permanent(err):
+                    _LOGGER.debug("PurpleAir revalidation stopped: %s", err)
+                    return
+                attempt += 1
+                if time.monotonic() - self._last_good_at > MAX_STALE_SECONDS:
+                    return
+                _LOGGER.debug("PurpleAir revalidation failed: %s", err)
+                continue
+            if self.on_update is not None:
+                self.on_update(result)
+            return
+
+    def cancel(self) -> None:
+        """Stop any background revalidation (entry unload)."""
+        if self._revalidate_task is not None:
+            self._revalidate_task.cancel()
+            self._revalidate_task = None
+
+    @property
+    def last_points(self) -> int:
+        return self.last_stats.points
+
+    @property
+    def last_good(self) -> Optional[PurpleAirResult]:
+        return self._last_good
+
+    @property
+    def last_good_age(self) -> float:
+        return time.monotonic() - self._last_good_at
+
+    def restore_last_good(self, result: PurpleAirResult, age: float) -> None:
+        """Seed the stale-data fallback, e.g. from the on-disk cache."""
+        self._last_good = result
+        self._last_good_at = time.monotonic() - age
+
+    def process(self, payload: Dict[str, Any]) -> PurpleAirResult:
+        """Turn a (possibly shared) feed payload into this client's result, once."""
+        with self._process_lock:
+            start = time.perf_counter()
+            # A payload handed out again (e.g. by a joined in-flight poll) is
+            # not recorded in the history twice
+            stamp = payload.get("data_time_stamp") or payload.get("time_stamp")
+            if stamp is None or stamp != self._processed_stamp or self._last_good is None:
+                selected = self._select_rows(payload)
+                result = self._process_response(selected, self.pm25_field)
+                rows_in_range = len(selected.get("data", []))
+                self._processed_stamp = stamp
+            else:
+                result = self._last_good
+                rows_in_range = self.last_stats.rows_in_range
+
+            # Only charge this client for polls it actually triggered
+            stats = replace(self.feed.last_stats)
+            if self.feed.last_requester is not self:
+                stats.points = 0
+            stats.process = time.perf_counter() - start
+            stats.rows_received = payload.get("row_count", len(payload.get("data", [])))
+            stats.rows_in_range = rows_in_range
+            stats.rows_used = len(result.sites)
+            self.last_stats = stats
+
+            self._last_good = result
+            self._last_good_at = time.monotonic()
+            return result
+
+    def _determine_fields(self) -> List[str]:
+        # Static fields (name, location, position rating) live in the MetadataCache
+        fields = ["confidence", self.pm25_field]
+
+        # For US EPA conversion we need humidity; we’ll always ask for it to keep the option usable
+        fields.append("humidity")
 
-        return self._process_response(data, pm25_field)
+        # Both PM fields, so every conversion can be computed from one poll
+        if self._config.all_conversions:
+            for source in CONVERSION_FIELDS.values():
+                if source not in fields:
+                    fields.append(source)
+
+        # The individual laser counters, to spot a failing one
+        if self._config.outlier_rejection:
+            fields.extend(["pm2.5_a", "pm2.5_b"])
+        return fields
+
+    def _check_metadata_version(self) -> None:
+        metadata = self.feed.metadata
+        version = (id(metadata), metadata.version)
+        if version != self._distances_version:
+            self._distances = {}
+            self._distance_array = None
+            self._in_range = {}
+            if self.bounding_box() is not None:
+                self._in_range = metadata.grid().within(
+                    self._config.search_coords, self._radius_miles()
+                )
+            self._distances_version = version
+
+    def _distance_column(self) -> "columnar.np.ndarray":
+        """_distance_to() per metadata column entry, then 0 for uncached sensors."""
+        self._check_metadata_version()
+        if self._distance_array is None:
+            origin = self._config.search_coords
+            coords = self.feed.metadata.columns().coords
+            self._distance_array = columnar.np.array(
+                [distance(origin, c if c is not None else origin) for c in coords]
+                + [distance(origin, origin)]
+            )
+        return self._distance_array
+
+    def _distance_to(self, sensor_index: Any, coords: Tuple[float, float]) -> float:
+        self._check_metadata_version()
+
+        d = self._distances.get(sensor_index)
+        if d is None:
+            d = distance(self._config.search_coords, coords)
+            self._distances[sensor_index] = d
+        return d
 
     def _determine_pm25_field(self) -> str:
-        # mirrors the Groovy logic around avg_period vs conversion; we focus on pm2.5 fields only
+        # The field the configured conversion is defined on; plain PM2.5 otherwise
         conv = (self._config.conversion or "").lower()
-        if conv in ("lrapa", "woodsmoke", "cf=1", "cf=1", "cf=1"):
-            return "pm2.5_cf_1"
-        # default PurpleAir PM2.5
+        for name, field_name in CONVERSION_FIELDS.items():
+            if name.lower() == conv:
+                return field_name
         return "pm2.5"
 
-    def _build_query(self, fields: List[str]) -> Dict[str, Any]:
-        if self._config.device_search and self._config.search_coords:
-            lat, lon = self._config.search_coords
-            dist2deg = distance2degrees(lat)
-            if self._config.unit == "miles":
-                lat_deg = self._config.search_range / dist2deg[0]
-                lon_deg = self._config.search_range / dist2deg[1]
-            else:
-                # km → miles
-                miles = self._config.search_range / 1.609
-                lat_deg = miles / dist2deg[0]
-                lon_deg = miles / dist2deg[1]
+    def _radius_miles(self) -> float:
+        if self._config.unit == "miles":
+            return self._config.search_range
+        # km → miles
+        return self._config.search_range / 1.609
 
-            return {
-                "fields": ",".join(fields),
-                "location_type": "0",
-                "max_age": 3600,
-                "nwlat": lat + lat_deg,
-                "nwlng": lon - lon_deg,
-                "selat": lat - lat_deg,
-                "selng": lon + lon_deg,
-            }
+    def bounding_box(self) -> Optional[Tuple[float, float, float, float]]:
+        """Return the box circumscribing the search circle as (nwlat, nwlng, selat, selng)."""
+        # LAN devices are listed explicitly; there is nothing to search
+        if self._config.local_hosts or not (
+            self._config.device_search and self._config.search_coords
+        ):
+            return None
 
-        # direct sensor mode
+        lat, lon = self._config.search_coords
+        dist2deg = distance2degrees(lat)
+        miles = self._radius_miles()
+        lat_deg = miles / dist2deg[0]
+        lon_deg = miles / dist2deg[1]
+
+        return (lat + lat_deg, lon - lon_deg, lat - lat_deg, lon + lon_deg)
+
+    def _build_query(self, fields: List[str]) -> Dict[str, Any]:
+        box = self.bounding_box()
+        if box is not None:
+            return box_query(fields, box)
+
+        # direct sensor mode; several batches get a PurpleAirBatchFeed instead
+        batches = direct_batches(fields, self.direct_sensors())
+        if batches:
+            return batches[0]
         params: Dict[str, Any] = {
             "fields": ",".join(fields),
         }
-        if self._config.sensor_index is not None:
-            params["show_only"] = str(self._config.sensor_index)
         if self._config.read_key:
             params["read_key"] = self._config.read_key
         return params
 
+    def direct_sensors(self) -> List[Tuple[int, Optional[str]]]:
+        """The configured sensor index (if any) followed by the sensor list."""
+        sensors = list(self._config.sensors)
+        if self._config.sensor_index is not None:
+            sensors.insert(0, (self._config.sensor_index, self._config.read_key or None))
+        return sensors
+
+    def _select_rows(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep the rows inside our search circle, optionally only the nearest K.
+
+        The upstream query is a rectangle (and, on a merged feed, the union of
+        several); the MetadataCache's SensorGrid trims it to the true radius.
+        """
+        fields = payload.get("fields", [])
+        if self.bounding_box() is None or "sensor_index" not in fields:
+            return payload
+
+        self._check_metadata_version()
+        idx = fields.index("sensor_index")
+        in_range = self._in_range
+        rows = [row for row in payload.get("data", []) if row[idx] in in_range]
+
+        k = self._config.nearest_count
+        if k > 0:
+            conf_idx = fields.index("confidence") if "confidence" in fields else None
+            pm_idx = fields.index(self.pm25_field) if self.pm25_field in fields else None
+            healthy = {
+                row[idx]
+                for row in rows
+                if conf_idx is not None
+                and row[conf_idx] is not None
+                and int(row[conf_idx]) >= MIN_CONFIDENCE
+                and pm_idx is not None
+                and row[pm_idx] is not None
+            }
+            nearest = {
+                key
+                for _, key in self.feed.metadata.grid().nearest(
+                    self._config.search_coords, k, accept=lambda key: key in healthy
+                )
+            }
+            rows = [row for row in rows if row[idx] in nearest]
+
+        return {**payload, "data": rows}
+
     def _process_response(self, payload: Dict[str, Any], pm25_field: str) -> PurpleAirResult:
         fields = payload.get("fields", [])
         field_index = {name: idx for idx, name in enumerate(fields)}
         data_rows = payload.get("data", [])
 
+        if columnar.HAS_NUMPY and len(data_rows) >= columnar.VECTOR_MIN_ROWS:
+            return self._process_columns(
+                data_rows, field_index, pm25_field, payload_stamp(payload)
+            )
+
         # Filter by confidence >= 90 like driver
         rows = [
             row
             for row in data_rows
             if row[field_index.get("confidence", -1)] is not None
-            and int(row[field_index["confidence"]]) >= 90
+            and int(row[field_index["confidence"]]) >= MIN_CONFIDENCE
         ]
 
         if not rows:
             raise RuntimeError("No valid PurpleAir sensors found in search area")
 
-        sensors: List[Dict[str, Any]] = []
+        sensors: List[SensorRecord] = []
 
         base_coords = self._config.search_coords
+        metadata = self.feed.metadata
+        use_weights = self._config.weighted and self._config.device_search and base_coords is not None
+        records = self._records
+        self._poll += 1
+        poll = self._poll
+        raw_sources = [
+            (source, field_index[source])
+            for source in dict.fromkeys(CONVERSION_FIELDS.values())
+            if source in field_index
+        ]
+        a_idx = field_index.get("pm2.5_a")
+        b_idx = field_index.get("pm2.5_b")
 
         for row in rows:
-            name = row[field_index["name"]]
+            sensor_index = row[field_index["sensor_index"]] if "sensor_index" in field_index else None
+            meta = metadata.get(sensor_index)
+            name = meta.name if meta else str(sensor_index)
             confidence = int(row[field_index["confidence"]])
             pm25_raw = float(row[field_index[pm25_field]]) if row[field_index[pm25_field]] is not None else None
             humidity = None
@@ -140,45 +1082,67 @@ class PurpleAirClient:
                 continue
 
             # Use sensor coords if weighted, otherwise base coords (center)
-            if self._config.weighted and "latitude" in field_index and "longitude" in field_index:
-                lat = float(row[field_index["latitude"]])
-                lon = float(row[field_index["longitude"]])
-                coords = (lat, lon)
+            if self._config.weighted and meta is not None and meta.coords is not None:
+                coords = meta.coords
             else:
                 coords = base_coords
 
-            position_rating = -1
-            if "position_rating" in field_index and row[field_index["position_rating"]] is not None:
-                position_rating = int(row[field_index["position_rating"]])
-
-            pm25_conv = apply_conversion(
-                self._config.conversion,
-                pm25_raw,
-                humidity,
+            position_rating = meta.position_rating if meta else -1
+
+            key = sensor_index if sensor_index is not None else name
+            record = records.get(key)
+            if record is None:
+                record = records[key] = SensorRecord(key)
+            elif record.seen == poll:
+                record = SensorRecord(key)  # repeated key within one payload
+
+            record.site = name
+            record.pm25 = pm25_raw
+            record.pm25_a = row[a_idx] if a_idx is not None else None
+            record.pm25_b = row[b_idx] if b_idx is not None else None
+            record.pm25_conv = self.convert(pm25_raw, humidity)
+            record.humidity = humidity
+            raw = record.raw
+            raw.clear()
+            for source, idx in raw_sources:
+                if row[idx] is not None:
+                    raw[source] = float(row[idx])
+            record.confidence = confidence
+            record.coords = coords
+            record.distance = (
+                self._distance_to(sensor_index, coords)
+                if use_weights and coords is not None
+                else None
             )
-
-            sensors.append(
-                {
-                    "site": name,
-                    "pm25": pm25_raw,
-                    "pm25_conv": pm25_conv,
-                    "confidence": confidence,
-                    "coords": coords,
-                    "position_rating": position_rating,
-                }
+            record.position_rating = position_rating
+            record.seen = poll
+            sensors.append(record)
+
+        # Forget sensors that stopped reporting once they outnumber the live ones
+        if len(records) > 2 * len(sensors) + 64:
+            self._records = {key: r for key, r in records.items() if r.seen == poll}
+
+        dropped: List[str] = []
+        if self._config.outlier_rejection:
+            accept = robust_mask(
+                [s.pm25_a for s in sensors],
+                [s.pm25_b for s in sensors],
+                [s.pm25_conv for s in sensors],
             )
+            dropped = sorted(s.site for s, ok in zip(sensors, accept) if not ok)
+            sensors = [s for s, ok in zip(sensors, accept) if ok]
 
         if not sensors:
             raise RuntimeError("No sensors with PM2.5 data")
 
-        if self._config.weighted and self._config.device_search and base_coords is not None:
+        if use_weights:
             avg_pm25 = sensor_average_weighted(sensors, "pm25_conv", base_coords)
         else:
             avg_pm25 = sensor_average(sensors, "pm25_conv")
 
-        aqi = get_part_2_5_aqi(avg_pm25)
+        aqi = self.breakpoints.aqi(avg_pm25)
         category = get_category(aqi)
-        sites = sorted(s["site"] for s in sensors)
+        sites = sorted(s.site for s in sensors)
 
         return PurpleAirResult(
             aqi=aqi,
@@ -186,23 +1150,340 @@ class PurpleAirClient:
             sites=sites,
             conversion=(self._config.conversion or "none"),
             weighted=self._config.weighted,
+            nowcast_aqi=self._nowcast_aqi(sensors, payload_stamp(payload), use_weights),
+            dropped=dropped,
+            conversions=(
+                self._conversion_aqis(sensors, use_weights)
+                if self._config.all_conversions
+                else {}
+            ),
+            zones=self._zone_aqis([s.key for s in sensors], [s.pm25_conv for s in sensors]),
         )
 
+    def _conversion_aqis(self, sensors: List[SensorRecord], use_weights: bool) -> Dict[str, int]:
+        """The AQI under every conversion, from the readings already fetched."""
+        aqis = {}
+        for name, source in CONVERSION_FIELDS.items():
+            convert = resolve_conversion(name)
+            ready = []
+            for s in sensors:
+                if source in s.raw:
+                    s.value = convert(s.raw[source], s.humidity)
+                    ready.append(s)
+            if not ready:
+                continue
+            if use_weights:
+                avg = sensor_average_weighted(ready, "value", self._config.search_coords)
+            else:
+                avg = sensor_average(ready, "value")
+            aqis[name] = self.breakpoints.aqi(avg)
+        return aqis
+
+    def _zone_aqis(self, keys: List[Any], values: List[float]) -> Dict[str, int]:
+        """The AQI interpolated at every zone from the sensors that were averaged."""
+        if self.zones is None:
+            return {}
+        metadata = self.feed.metadata
+        located_keys, coords, located = [], [], []
+        for key, value in zip(keys, values):
+            meta = metadata.get(key)
+            if meta is not None and meta.coords is not None:
+                located_keys.append(key)
+                coords.append(meta.coords)
+                located.append(value)
+        return {
+            name: self.breakpoints.aqi(pm)
+            for name, pm in self.zones.estimate(located_keys, coords, located).items()
+        }
+
+    def _nowcast_aqi(
+        self, sensors: List[SensorRecord], stamp: float, use_weights: bool
+    ) -> Optional[int]:
+        """Record this poll's readings and average the sensors' NowCasts."""
+        history = self.history
+        buckets = self.buckets
+        with history.lock:
+            for sensor in sensors:
+                history.add(sensor.key, sensor.pm25_conv, stamp)
+                if buckets is not None:
+                    buckets.add(sensor.key, sensor.site, sensor.pm25_conv, stamp)
+            keys = [sensor.key for sensor in sensors]
+            if columnar.HAS_NUMPY:
+                concs = history.nowcast_column(keys, stamp).tolist()
+            else:
+                concs = [history.nowcast(key, stamp) for key in keys]
+            history.prune(stamp)
+
+        ready = []
+        for sensor, conc in zip(sensors, concs):
+            if conc is not None and not math.isnan(conc):  # not enough hours
+                sensor.value = conc
+                ready.append(sensor)
+
+        if not ready:
+            return None
+        if use_weights:
+            return self.breakpoints.aqi(
+                sensor_average_weighted(ready, "value", self._config.search_coords)
+            )
+        return self.breakpoints.aqi(sensor_average(ready, "value"))
+
+    def _process_columns(
+        self,
+        data_rows: List[List[Any]],
+        field_index: Dict[str, int],
+        pm25_field: str,
+        stamp: float,
+    ) -> PurpleAirResult:
+        """Array-based twin of _process_response for large row counts."""
+        np = columnar.np
+
+        confidence = columnar.column(data_rows, field_index.get("confidence"))
+        keep = confidence >= MIN_CONFIDENCE
+        if not keep.any():
+            raise RuntimeError("No valid PurpleAir sensors found in search area")
+
+        pm25_raw = columnar.column(data_rows, field_index.get(pm25_field))
+        keep &= ~np.isnan(pm25_raw)
+        if not keep.any():
+            raise RuntimeError("No sensors with PM2.5 data")
 
-def sensor_average(sensors: List[Dict[str, Any]], field: str) -> float:
-    values = [float(s[field]) for s in sensors if s.get(field) is not None]
+        humidity = columnar.column(data_rows, field_index.get("humidity"))
+        pm25_conv = self.convert_column(pm25_raw[keep], humidity[keep])
+
+        # Static details by position in the metadata columns, -1 = not cached
+        idx = field_index.get("sensor_index")
+        kept = keep.tolist()
+        if idx is not None:
+            indices = [row[idx] for row in compress(data_rows, kept)]
+        else:
+            indices = [None] * len(pm25_conv)
+        columns = self.feed.metadata.columns()
+        position = columns.position
+        pos = np.array([position.get(i, -1) for i in indices], dtype=np.intp)
+        names = columns.names
+        sites = [names[p] if p >= 0 else str(i) for p, i in zip(pos.tolist(), indices)]
+
+        dropped: List[str] = []
+        if self._config.outlier_rejection:
+            accept = columnar.robust_mask(
+                columnar.column(data_rows, field_index.get("pm2.5_a"))[keep],
+                columnar.column(data_rows, field_index.get("pm2.5_b"))[keep],
+                pm25_conv,
+                max_diff=AB_MAX_DIFF,
+                max_rpd=AB_MAX_RPD,
+                scale=MAD_SCALE,
+                cutoff=MAD_CUTOFF,
+                min_sensors=MAD_MIN_SENSORS,
+            )
+            keep[np.flatnonzero(keep)[~accept]] = False
+            accepted = accept.tolist()
+            dropped = sorted(site for site, ok in zip(sites, accepted) if not ok)
+            pm25_conv = pm25_conv[accept]
+            pos = pos[accept]
+            indices = list(compress(indices, accepted))
+            sites = list(compress(sites, accepted))
+        keys = [i if i is not None else site for i, site in zip(indices, sites)]
+
+        use_weights = (
+            self._config.weighted
+            and self._config.device_search
+            and self._config.search_coords is not None
+        )
+        if use_weights:
+            distances = self._distance_column()[pos]
+            ratings = columns.ratings[pos]
+            avg_pm25 = columnar.average_weighted(pm25_conv, distances, ratings)
+        else:
+            avg_pm25 = columnar.average(pm25_conv)
+
+        # NowCast, averaged the same way over the sensors that have one
+        history = self.history
+        buckets = self.buckets
+        with history.lock:
+            for key, site, value in zip(keys, sites, pm25_conv.tolist()):
+                history.add(key, value, stamp)
+                if buckets is not None:
+                    buckets.add(key, site, value, stamp)
+            nowcasts = history.nowcast_column(keys, stamp)
+            history.prune(stamp)
+        ready = ~np.isnan(nowcasts)
+        nowcast_aqi = None
+        if ready.any():
+            if use_weights:
+                avg_nowcast = columnar.average_weighted(
+                    nowcasts[ready], distances[ready], ratings[ready]
+                )
+            else:
+                avg_nowcast = columnar.average(nowcasts[ready])
+            nowcast_aqi = self.breakpoints.aqi(avg_nowcast)
+
+        # Every conversion in one batched pass over the same sensors
+        conversion_aqis: Dict[str, int] = {}
+        if self._config.all_conversions:
+            rh = humidity[keep]
+            sources = {
+                source: columnar.column(data_rows, field_index.get(source))[keep]
+                for source in set(CONVERSION_FIELDS.values())
+            }
+            for name, source in CONVERSION_FIELDS.items():
+                present = ~np.isnan(sources[source])
+                if not present.any():
+                    continue
+                convert = resolve_column_conversion(name)
+                values = convert(sources[source][present], rh[present])
+                if use_weights:
+                    avg = columnar.average_weighted(
+                        values, distances[present], ratings[present]
+                    )
+                else:
+                    avg = columnar.average(values)
+                conversion_aqis[name] = self.breakpoints.aqi(avg)
+
+        aqi = self.breakpoints.aqi(avg_pm25)
+        return PurpleAirResult(
+            aqi=aqi,
+            category=get_category(aqi),
+            sites=sorted(sites),
+            conversion=(self._config.conversion or "none"),
+            weighted=self._config.weighted,
+            nowcast_aqi=nowcast_aqi,
+            dropped=dropped,
+            conversions=conversion_aqis,
+            zones=self._zone_aqis(keys, pm25_conv.tolist()),
+        )
+
+
+def estimate_points(payload: Dict[str, Any]) -> int:
+    fields = payload.get("fields", [])
+    # A streamed payload only keeps usable rows, but every row was billed
+    rows = payload.get("row_count", len(payload.get("data", [])))
+    return POINTS_PER_CALL + rows * len(fields) * POINTS_PER_FIELD
+
+
+def payload_stamp(payload: Dict[str, Any]) -> float:
+    """When a payload's readings were taken, falling back to now."""
+    return payload.get("data_time_stamp") or payload.get("time_stamp") or time.time()
+
+
+def box_query(fields: List[str], box: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    nwlat, nwlng, selat, selng = box
+    return {
+        "fields": ",".join(fields),
+        "location_type": "0",
+        "max_age": 3600,
+        "nwlat": nwlat,
+        "nwlng": nwlng,
+        "selat": selat,
+        "selng": selng,
+    }
+
+
+def direct_batches(
+    fields: List[str], sensors: List[Tuple[int, Optional[str]]]
+) -> List[Dict[str, Any]]:
+    """Group sensors into show_only queries, one per read key (public ones together).
+
+    Duplicate indices are asked for once; batches hold at most MAX_SHOW_ONLY.
+    """
+    groups: Dict[Optional[str], List[int]] = {}
+    seen = set()
+    for index, read_key in sensors:
+        if index in seen:
+            continue
+        seen.add(index)
+        groups.setdefault(read_key or None, []).append(index)
+
+    batches: List[Dict[str, Any]] = []
+    for read_key, indices in groups.items():
+        for start in range(0, len(indices), MAX_SHOW_ONLY):
+            params: Dict[str, Any] = {
+                "fields": ",".join(fields),
+                "show_only": ",".join(str(i) for i in indices[start : start + MAX_SHOW_ONLY]),
+            }
+            if read_key:
+                params["read_key"] = read_key
+            batches.append(params)
+    return batches
+
+
+def parse_sensors(value: Optional[str]) -> List[Tuple[int, Optional[str]]]:
+    """Parse the ``sensors`` option: ``index[:read_key]`` entries, comma-separated.
+
+    Raises ValueError on an index that is not a number.
+    """
+    sensors: List[Tuple[int, Optional[str]]] = []
+    for entry in (value or "").split(","):
+        index, _, read_key = entry.strip().partition(":")
+        if not index:
+            continue
+        sensors.append((int(index), read_key.strip() or None))
+    return sensors
+
+
+def merge_payloads(payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Concatenate the rows of responses to the same query over different sensors."""
+    merged = dict(payloads[0])
+    fields = merged.get("fields", [])
+    data: List[List[Any]] = []
+    dropped: List[Any] = []
+    row_count = 0
+    for payload in payloads:
+        rows = payload.get("data", [])
+        if payload.get("fields", []) != fields:
+            order = [payload["fields"].index(name) for name in fields]
+            rows = [[row[i] for i in order] for row in rows]
+        data.extend(rows)
+        dropped.extend(payload.get("dropped", []))
+        row_count += payload.get("row_count", len(rows))
+    merged["data"] = data
+    if "row_count" in merged:
+        merged["row_count"] = row_count
+    if "dropped" in merged:
+        merged["dropped"] = dropped
+    return merged
+
+
+def robust_mask(
+    pm_a: List[Optional[float]], pm_b: List[Optional[float]], values: List[float]
+) -> List[bool]:
+    """Which sensors to keep: A/B channels agree and ``values`` is no MAD outlier.
+
+    Sensors reporting a single channel are never rejected by the A/B check.
+    """
+    keep = []
+    for a, b in zip(pm_a, pm_b):
+        if a is None or b is None:
+            keep.append(True)
+            continue
+        diff = abs(a - b)
+        keep.append(not (diff > AB_MAX_DIFF and (a + b <= 0 or 2 * diff / (a + b) > AB_MAX_RPD)))
+
+    agreed = [v for v, ok in zip(values, keep) if ok]
+    if len(agreed) < MAD_MIN_SENSORS:
+        return keep
+    med = statistics.median(agreed)
+    mad = statistics.median([abs(v - med) for v in agreed])
+    if mad <= 0:
+        return keep
+    return [ok and MAD_SCALE * abs(v - med) / mad <= MAD_CUTOFF for v, ok in zip(values, keep)]
+
+
+def sensor_average(sensors: List[SensorRecord], field: str) -> float:
+    values = [v for v in (getattr(s, field) for s in sensors) if v is not None]
     if not values:
         return 0.0
     return sum(values) / len(values)
 
 
 def sensor_average_weighted(
-    sensors: List[Dict[str, Any]], field: str, origin: Tuple[float, float]
+    sensors: List[SensorRecord], field: str, origin: Tuple[float, float]
 ) -> float:
     distances = []
     for s in sensors:
-        coords = s.get("coords") or origin
-        d = distance(origin, coords)
+        d = s.distance
+        if d is None:
+            d = distance(origin, s.coords or origin)
         distances.append(d if d > 0 else 0.001)  # avoid div/0
 
     nearest = min(distances)
@@ -210,8 +1491,8 @@ def sensor_average_weighted(
     weight_total = 0.0
 
     for s, d in zip(sensors, distances):
-        val = float(s[field])
-        position_rating = int(s.get("position_rating", -1))
+        val = getattr(s, field)
+        position_rating = s.position_rating
         weight = nearest / math.sqrt(d) * (position_rating + 1)
         weighted_sum += val * weight
         weight_total += weight
@@ -221,65 +1502,31 @@ def sensor_average_weighted(
     return weighted_sum / weight_total
 
 
-def get_part_2_5_aqi(part_count: float) -> int:
-    c = math.floor(10 * part_count) / 10.0
-    if 0 <= c < 12.1:
-        return aqi_linear(50, 0, 12, 0, c)
-    elif 12.1 <= c < 35.5:
-        return aqi_linear(100, 51, 35.4, 12.1, c)
-    elif 35.5 <= c < 55.5:
-        return aqi_linear(150, 101, 55.4, 35.5, c)
-    elif 55.5 <= c < 150.5:
-        return aqi_linear(200, 151, 150.4, 55.5, c)
-    elif 150.5 <= c < 250.5:
-        return aqi_linear(300, 201, 250.4, 150.5, c)
-    elif 250.5 <= c < 350.5:
-        return aqi_linear(400, 301, 350.4, 250.5, c)
-    elif 350.5 <= c < 500.5:
-        return aqi_linear(500, 401, 500.4, 350.5, c)
-    elif c >= 500.5:
-        return round(c)
-    return -1
-
-
-def aqi_linear(aqi_high: int, aqi_low: int, conc_high: float, conc_low: float, conc: float) -> int:
-    a = ((conc - conc_low) / (conc_high - conc_low)) * (aqi_high - aqi_low) + aqi_low
-    return int(round(a))
+def get_part_2_5_aqi(part_count: float, breakpoints: Breakpoints = EPA_2012) -> int:
+    return breakpoints.aqi(part_count)
 
 
 def get_category(aqi: int) -> str:
-    if 0 <= aqi <= 50:
-        return "Good"
-    if 51 <= aqi <= 100:
-        return "Moderate"
-    if 101 <= aqi <= 150:
-        return "Unhealthy for sensitive groups"
-    if 151 <= aqi <= 200:
-        return "Unhealthy"
-    if 201 <= aqi <= 300:
-        return "Very unhealthy"
-    if 301 <= aqi <= 500:
-        return "Hazardous"
-    if aqi > 500:
-        return "Extremely hazardous!"
-    return "error"
+    category = category_for(aqi)
+    return category.name if category else "error"
+
+
+def resolve_conversion(conversion: str) -> Callable[[float, Optional[float]], float]:
+    """The ``(pm25, rh) -> pm25`` function for a conversion name."""
+    return CONVERSIONS.get((conversion or "").lower(), no_conversion)
 
 
 def apply_conversion(conversion: str, pm25: float, rh: Optional[float]) -> float:
-    conv = (conversion or "").lower()
-    if conv == "us epa" or conv == "us_epa":
-        if rh is None:
-            # fallback: no humidity, return raw
-            return pm25
-        return us_epa_conversion(pm25, rh)
-    if conv == "woodsmoke":
-        return woodsmoke_conversion(pm25)
-    if conv in ("aq&u", "aq and u", "aq_and_u", "aq u"):
-        return aq_and_u_conversion(pm25)
-    if conv == "lrapa":
-        return lrapa_conversion(pm25)
-    # none / default
-    return pm25
+    return resolve_conversion(conversion)(pm25, rh)
+
+
+def no_conversion(pm: float, rh: Optional[float]) -> float:
+    return pm
+
+
+def us_epa_or_raw(pm: float, rh: Optional[float]) -> float:
+    # fallback: no humidity, return raw
+    return pm if rh is None else us_epa_conversion(pm, rh)
 
 
 def us_epa_conversion(pm: float, rh: float) -> float:
@@ -315,23 +1562,39 @@ def lrapa_conversion(pm: float) -> float:
     return max(c, 0.0)
 
 
-def distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
-    # Haversine, returns miles
-    lat1, lon1 = a
-    lat2, lon2 = b
-    R = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    aa = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(aa), math.sqrt(1 - aa))
-    d_meters = R * c
-    d_km = d_meters / 1000.0
-    return d_km / 1.609  # miles
-
-
-def distance2degrees(latitude: float) -> Tuple[float, float]:
-    lat_miles_per_degree = 69.172 * math.cos(math.radians(latitude))
-    lon_miles_per_degree = 68.972
-    return lat_miles_per_degree, lon_miles_per_degree
+def _woodsmoke(pm: float, rh: Optional[float]) -> float:
+    return woodsmoke_conversion(pm)
+
+
+def _aq_and_u(pm: float, rh: Optional[float]) -> float:
+    return aq_and_u_conversion(pm)
+
+
+def _lrapa(pm: float, rh: Optional[float]) -> float:
+    return lrapa_conversion(pm)
+
+
+CONVERSIONS: Dict[str, Callable[[float, Optional[float]], float]] = {
+    "us epa": us_epa_or_raw,
+    "us_epa": us_epa_or_raw,
+    "woodsmoke": _woodsmoke,
+    "aq&u": _aq_and_u,
+    "aq and u": _aq_and_u,
+    "aq_and_u": _aq_and_u,
+    "aq u": _aq_and_u,
+    "lrapa": _lrapa,
+}
+
+# The columnar path's twin of each CONVERSIONS function
+COLUMN_CONVERSIONS: Dict[Callable[[float, Optional[float]], float], Callable[[Any, Any], Any]] = {
+    no_conversion: columnar.no_conversion,
+    us_epa_or_raw: columnar.us_epa_or_raw,
+    _woodsmoke: columnar.woodsmoke,
+    _aq_and_u: columnar.aq_and_u,
+    _lrapa: columnar.lrapa,
+}
+
+
+def resolve_column_conversion(conversion: str) -> Callable[[Any, Any], Any]:
+    """resolve_conversion() for arrays of readings and humidities."""
+    return COLUMN_CONVERSIONS[resolve_conversion(conversion)]
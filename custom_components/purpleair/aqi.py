@@ -0,0 +1,141 @@
+# custom_components/purpleair/aqi.py
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from . import columnar
+
+
+@dataclass(frozen=True)
+class Category:
+    name: str
+    level: int
+    color: str
+    advisory: str
+    aqi_low: int  # lowest AQI in the category
+
+
+CATEGORIES: Tuple[Category, ...] = (
+    Category("Good", 1, "Green", "Air quality is good. Enjoy your day!", 0),
+    Category(
+        "Moderate", 2, "Yellow",
+        "Sensitive individuals should limit prolonged outdoor exertion.", 51,
+    ),
+    Category(
+        "Unhealthy for Sensitive Groups", 3, "Orange",
+        "Reduce prolonged outdoor exertion if sensitive.", 101,
+    ),
+    Category("Unhealthy", 4, "Red", "Everyone may begin to experience health effects.", 151),
+    Category("Very Unhealthy", 5, "Purple", "Health alert: avoid outdoor exertion.", 201),
+    Category("Hazardous", 6, "Maroon", "Emergency conditions. Stay indoors.", 301),
+)
+
+_CATEGORY_LOWS = [c.aqi_low for c in CATEGORIES]
+_BY_NAME = {c.name: c for c in CATEGORIES}
+
+
+def category_for(aqi: int) -> Optional[Category]:
+    """The category an AQI falls in; above 500 is still Hazardous."""
+    if aqi < 0:
+        return None
+    return CATEGORIES[bisect_right(_CATEGORY_LOWS, aqi) - 1]
+
+
+def category_named(name: Optional[str]) -> Optional[Category]:
+    return _BY_NAME.get(name) if name else None
+
+
+class Breakpoints:
+    """A PM2.5 breakpoint table: concentration bands mapped linearly onto AQI bands.
+
+    Concentrations are truncated to 0.1 µg/m³ and the band is found with
+    bisect.  Above the last band ``beyond`` decides: ``"concentration"``
+    reports the concentration itself as the AQI (the historical behaviour
+    of this integration), ``"extend"`` continues the top band's line.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bands: Iterable[Tuple[float, float, int, int]],  # conc_low, conc_high, aqi_low, aqi_high
+        beyond: str = "concentration",
+    ) -> None:
+        self.name = name
+        self.bands = tuple(bands)
+        self.beyond = beyond
+        self._lows = [band[0] for band in self.bands]
+        # Upper edge of the table: anything at or above it is beyond the index
+        self._top = round(self.bands[-1][1] + 0.1, 1)
+
+    def aqi(self, pm: float) -> int:
+        c = math.floor(10 * pm) / 10.0
+        if c >= self._top:
+            if self.beyond == "concentration":
+                return round(c)
+            conc_low, conc_high, aqi_low, aqi_high = self.bands[-1]
+            return aqi_linear(aqi_high, aqi_low, conc_high, conc_low, c)
+
+        i = bisect_right(self._lows, c) - 1
+        if i < 0:
+            return -1
+        conc_low, conc_high, aqi_low, aqi_high = self.bands[i]
+        return aqi_linear(aqi_high, aqi_low, conc_high, conc_low, c)
+
+    def aqi_many(self, values: Iterable[float]) -> List[int]:
+        """aqi() for many concentrations at once (vectorized with NumPy)."""
+        if not columnar.HAS_NUMPY:
+            return [self.aqi(v) for v in values]
+
+        np = columnar.np
+        pm = np.asarray(values, dtype=float)
+        if not pm.size:
+            return []
+        c = np.floor(10 * pm) / 10.0
+        i = np.searchsorted(self._lows, c, side="right") - 1
+        above = c >= self._top
+        if self.beyond == "extend":
+            i = np.where(above, len(self.bands) - 1, i)
+        band = np.array(self.bands, dtype=float)[np.clip(i, 0, None)]
+        conc_low, conc_high, aqi_low, aqi_high = band.T
+        linear = np.round(((c - conc_low) / (conc_high - conc_low)) * (aqi_high - aqi_low) + aqi_low)
+        if self.beyond == "concentration":
+            linear = np.where(above, np.round(c), linear)
+        return np.where(i < 0, -1, linear).astype(int).tolist()
+
+
+def aqi_linear(aqi_high: int, aqi_low: int, conc_high: float, conc_low: float, conc: float) -> int:
+    a = ((conc - conc_low) / (conc_high - conc_low)) * (aqi_high - aqi_low) + aqi_low
+    return int(round(a))
+
+
+# EPA PM2.5 breakpoints before and after the 2024 revision of the NAAQS
+EPA_2012 = Breakpoints(
+    "EPA 2012",
+    [
+        (0.0, 12.0, 0, 50),
+        (12.1, 35.4, 51, 100),
+        (35.5, 55.4, 101, 150),
+        (55.5, 150.4, 151, 200),
+        (150.5, 250.4, 201, 300),
+        (250.5, 350.4, 301, 400),
+        (350.5, 500.4, 401, 500),
+    ],
+)
+EPA_2024 = Breakpoints(
+    "EPA 2024",
+    [
+        (0.0, 9.0, 0, 50),
+        (9.1, 35.4, 51, 100),
+        (35.5, 55.4, 101, 150),
+        (55.5, 125.4, 151, 200),
+        (125.5, 225.4, 201, 300),
+        (225.5, 325.4, 301, 500),
+    ],
+    beyond="extend",
+)
+
+BREAKPOINTS = {bp.name: bp for bp in (EPA_2012, EPA_2024)}
@@ -0,0 +1,315 @@
+# custom_components/purpleair/backfill.py
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from .api import BASE_URL, TRANSIENT_ERRORS
+from .nowcast import HOURS
+from .resilience import PurpleAirHTTPError, parse_retry_after
+from .transport import PurpleAirTransport
+
+if TYPE_CHECKING:
+    from .api import PurpleAirClient
+
+_LOGGER = logging.getLogger(__name__)
+
+HISTORY_URL = BASE_URL + "/{index}/history/csv"
+HISTORY_AVERAGE = 60  # minutes; hourly rows, like the NowCast history
+MAX_SPAN = 14 * 86400  # longest window the API serves per request at that average
+MAX_PARALLEL = 4
+INSERT_BATCH = 1000
+BACKFILL_INTERVAL = 24 * 3600  # seconds between top-ups while running
+
+# The history endpoint names the PM fields differently from /v1/sensors
+HISTORY_FIELDS = {"pm2.5": "pm2.5_atm", "pm2.5_cf_1": "pm2.5_cf_1"}
+
+# Store column per history field
+COLUMNS = {"pm2.5_atm": "pm25_atm", "pm2.5_cf_1": "pm25_cf_1", "humidity": "humidity"}
+
+Sample = Tuple[int, int, Optional[float], Optional[float], Optional[float]]
+
+
+class HistoryStore:
+    """Hourly readings per sensor in an SQLite file.
+
+    One WITHOUT ROWID table clustered on (sensor, ts), so each sensor's
+    samples sit together on disk and a range over weeks reads a handful of
+    pages.  Inserts merge with what is stored, keeping columns the new row
+    lacks.  A second table records, per sensor and column, up to when the
+    history was fetched without gaps.  Every method blocks; call them from
+    the executor.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS samples ("
+                " sensor INTEGER NOT NULL, ts INTEGER NOT NULL,"
+                " pm25_atm REAL, pm25_cf_1 REAL, humidity REAL,"
+                " PRIMARY KEY (sensor, ts)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                " sensor INTEGER NOT NULL, col TEXT NOT NULL, until INTEGER NOT NULL,"
+                " PRIMARY KEY (sensor, col)) WITHOUT ROWID"
+            )
+
+    def insert(self, rows: Iterable[Sample]) -> None:
+        """Write (sensor, ts, pm25_atm, pm25_cf_1, humidity) rows in one transaction."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO samples VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (sensor, ts) DO UPDATE SET"
+                " pm25_atm = coalesce(excluded.pm25_atm, pm25_atm),"
+                " pm25_cf_1 = coalesce(excluded.pm25_cf_1, pm25_cf_1),"
+                " humidity = coalesce(excluded.humidity, humidity)",
+                rows,
+            )
+
+    def covered(self, column: str) -> Dict[int, int]:
+        """Per sensor, the time up to which ``column`` was fetched without gaps."""
+        with self._lock:
+            return dict(
+                self._db.execute(
+                    "SELECT sensor, until FROM coverage WHERE col = ?", (_column(column),)
+                )
+            )
+
+    def mark_covered(self, sensor: int, column: str, until: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO coverage VALUES (?, ?, ?)"
+                " ON CONFLICT (sensor, col) DO UPDATE SET until = max(until, excluded.until)",
+                (sensor, _column(column), until),
+            )
+
+    def samples(
+        self, sensors: List[int], column: str, start: int, end: int
+    ) -> List[Tuple[int, int, float, Optional[float]]]:
+        """(sensor, ts, value, humidity) in time order."""
+        column = _column(column)
+        marks = ",".join("?" * len(sensors))
+        with self._lock:
+            return self._db.execute(
+                f"SELECT sensor, ts, {column}, humidity FROM samples"
+                f" WHERE sensor IN ({marks}) AND ts >= ? AND ts < ? AND {column} IS NOT NULL"
+                " ORDER BY ts",
+                (*sensors, start, end),
+            ).fetchall()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            rows, sensors, oldest, newest = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sensor), MIN(ts), MAX(ts) FROM samples"
+            ).fetchone()
+        return {"rows": rows, "sensors": sensors, "oldest": oldest, "newest": newest}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class PurpleAirBackfill:
+    """Fill a HistoryStore from the sensor history endpoint.
+
+    Every cloud sensor in the client's NowCast history gets the complete
+    hours since it was last covered, going back at most ``days``, in
+    windows of at most MAX_SPAN.  Sensors are fetched MAX_PARALLEL at a
+    time, each one's windows oldest first; each CSV body is parsed line by
+    line as it arrives and written in batches of INSERT_BATCH, so a long
+    backfill never sits in memory whole.
+
+    A sensor's coverage only moves past a window once the window is fully
+    stored, and its first failed window ends that sensor's run, so the
+    next run picks up exactly where the gap begins.  Afterwards the stored
+    hours seed the NowCast history, which is then complete right after a
+    new install or a long outage.
+    """
+
+    def __init__(
+        self,
+        transport: PurpleAirTransport,
+        api_key: str,
+        store: HistoryStore,
+        days: int,
+        url: str = HISTORY_URL,
+    ) -> None:
+        self._transport = transport
+        self._api_key = api_key
+        self.store = store
+        self.days = days
+        self._url = url
+        self._semaphore = asyncio.Semaphore(MAX_PARALLEL)
+        self._running = False
+        self.last_rows = 0
+
+    async def async_run(self, client: "PurpleAirClient") -> int:
+        """Backfill the client's sensors; returns the number of rows stored."""
+        with client.history.lock:
+            sensors = [key for key in client.history.keys() if isinstance(key, int)]
+        if self._running or not sensors:
+            return 0
+        self._running = True
+        try:
+            field = HISTORY_FIELDS.get(client.pm25_field, "pm2.5_atm")
+            read_keys = {index: key for index, key in client.direct_sensors() if key}
+            loop = asyncio.get_running_loop()
+
+            covered = await loop.run_in_executor(None, self.store.covered, field)
+            now = int(time.time())
+            until = now - now % (HISTORY_AVERAGE * 60)  # end of the last complete hour
+            plans = {}
+            for sensor in sensors:
+                start = max(covered.get(sensor, 0), now - self.days * 86400)
+                windows = []
+                while start < until:
+                    end = min(start + MAX_SPAN, until)
+                    windows.append((start, end))
+                    start = end
+                if windows:
+                    plans[sensor] = windows
+
+            counts = await asyncio.gather(
+                *(
+                    self._fetch_sensor(sensor, windows, field, read_keys.get(sensor))
+                    for sensor, windows in plans.items()
+                )
+            )
+            self.last_rows = sum(counts)
+
+            await loop.run_in_executor(None, self._seed, client, sensors, field, now)
+
+            _LOGGER.debug(
+                "Backfilled %d hourly rows for %d PurpleAir sensors",
+                self.last_rows, len(plans),
+            )
+            return self.last_rows
+        finally:
+            self._running = False
+
+    def _seed(self, client: "PurpleAirClient", sensors: List[int], field: str, now: int) -> None:
+        """Fill the NowCast window from the store; blocks, so runs in the executor."""
+        recent = self.store.samples(sensors, field, now - HOURS * 3600, now)
+        history = client.history
+        with history.lock:
+            for sensor, stamp, value, humidity in recent:
+                history.fill(sensor, client.convert(value, humidity), stamp)
+
+    async def _fetch_sensor(
+        self, sensor: int, windows: List[Tuple[int, int]], field: str, read_key: Optional[str]
+    ) -> int:
+        """Fetch one sensor's windows in order, stopping at the first failure."""
+        loop = asyncio.get_running_loop()
+        stored = 0
+        async with self._semaphore:
+            for start, end in windows:
+                try:
+                    stored += await self._fetch(sensor, start, end, field, read_key)
+                except TRANSIENT_ERRORS as err:
+                    _LOGGER.debug("PurpleAir history for %s failed: %s", sensor, err)
+                    break
+                await loop.run_in_executor(None, self.store.mark_covered, sensor, field, end)
+        return stored
+
+    async def _fetch(
+        self, sensor: int, start: int, end: int, field: str, read_key: Optional[str]
+    ) -> int:
+        params: Dict[str, Any] = {
+            "start_timestamp": start,
+            "end_timestamp": end,
+            "average": HISTORY_AVERAGE,
+            "fields": f"{field},humidity",
+        }
+        if read_key:
+            params["read_key"] = read_key
+
+        loop = asyncio.get_running_loop()
+        stored = 0
+        async with self._transport.get(
+            self._url.format(index=sensor),
+            headers={"X-API-Key": self._api_key},
+            params=params,
+            timeout=aiohttp.ClientTimeout(total=120),
+        ) as resp:
+            if resp.status != 200:
+                raise PurpleAirHTTPError(
+                    resp.status,
+                    await resp.text(),
+                    parse_retry_after(resp.headers.get("Retry-After")),
+                )
+            parser = HistoryCSVParser(sensor)
+            batch: List[Sample] = []
+            async for line in resp.content:
+                row = parser.feed_line(line)
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= INSERT_BATCH:
+                    await loop.run_in_executor(None, self.store.insert, batch)
+                    stored += len(batch)
+                    batch = []
+            if batch:
+                await loop.run_in_executor(None, self.store.insert, batch)
+                stored += len(batch)
+        return stored
+
+
+class HistoryCSVParser:
+    """Turn the lines of a history CSV into store rows, one at a time.
+
+    The first line names the columns; rows without a timestamp are skipped.
+    """
+
+    def __init__(self, sensor: int) -> None:
+        self.sensor = sensor
+        self._columns: Optional[Dict[str, int]] = None
+
+    def feed_line(self, line: bytes) -> Optional[Sample]:
+        cells = line.decode().strip().split(",")
+        if self._columns is None:
+            self._columns = {name.strip().strip('"'): i for i, name in enumerate(cells)}
+            return None
+        if len(cells) < len(self._columns):
+            return None
+
+        columns = self._columns
+        stamp = _number(cells, columns.get("time_stamp"))
+        if stamp is None:
+            return None
+        return (
+            self.sensor,
+            int(stamp),
+            _number(cells, columns.get("pm2.5_atm")),
+            _number(cells, columns.get("pm2.5_cf_1")),
+            _number(cells, columns.get("humidity")),
+        )
+
+
+def _number(cells: List[str], idx: Optional[int]) -> Optional[float]:
+    if idx is None:
+        return None
+    try:
+        return float(cells[idx])
+    except ValueError:
+        return None
+
+
+def _column(field: str) -> str:
+    """The store column for a history field (or a column name)."""
+    if field in COLUMNS:
+        return COLUMNS[field]
+    if field in COLUMNS.values():
+        return field
+    raise ValueError(f"No stored column for {field}")
@@ -9,6 +9,11 @@ from homeassistant.const import CONF_API_KEY, CONF_LATITUDE, CONF_LONGITUDE
 from homeassistant.core import callback
 
 from . import DOMAIN
+from .api import parse_sensors
+from .aqi import BREAKPOINTS
+from .interpolate import METHODS, parse_zones
+from .lan import parse_hosts
+from .offload import OFFLOAD_MODES
 
 CONVERSION_OPTIONS = [
     "US EPA",
@@ -32,11 +37,36 @@ class PurpleAirConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input: dict[str, Any] | None = None):
         """Initial setup."""
-        if self._async_current_entries():
-            return self.async_abort(reason="single_instance_allowed")
-
+        errors: dict[str, str] = {}
         if user_input is not None:
-            return self.async_create_entry(title="PurpleAir", data=user_input)
+            # Several locations may be configured; the hub batches their requests
+            hosts = parse_hosts(user_input.get("local_hosts"))
+            try:
+                parse_zones(user_input.get("zones"))
+            except ValueError:
+                errors["zones"] = "invalid_zones"
+            try:
+                sensors = [index for index, _ in parse_sensors(user_input.get("sensors"))]
+            except ValueError:
+                errors["sensors"] = "invalid_sensors"
+            if not errors:
+                if hosts:
+                    unique_id = "lan_" + ",".join(sorted(hosts))
+                    title = "PurpleAir" if not self._async_current_entries() else "PurpleAir (LAN)"
+                elif user_input.get("device_search", True):
+                    lat = float(user_input[CONF_LATITUDE])
+                    lon = float(user_input[CONF_LONGITUDE])
+                    unique_id = f"{lat:.4f},{lon:.4f}"
+                    title = "PurpleAir" if not self._async_current_entries() else f"PurpleAir ({lat:.3f}, {lon:.3f})"
+                else:
+                    if user_input.get("sensor_index") is not None:
+                        sensors.insert(0, user_input["sensor_index"])
+                    unique_id = "sensor_" + ",".join(str(i) for i in sorted(set(sensors)))
+                    title = "PurpleAir " + ", ".join(str(i) for i in sensors)
+
+                await self.async_set_unique_id(unique_id)
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(title=title, data=user_input)
 
         # Defaults from HA location
         default_lat = self.hass.config.latitude
@@ -60,15 +90,49 @@ class PurpleAirConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 # Conversion & behavior
                 vol.Optional("weighted", default=True): bool,
                 vol.Optional("conversion", default="US EPA"): vol.In(CONVERSION_OPTIONS),
+                vol.Optional("aqi_breakpoints", default="EPA 2012"): vol.In(list(BREAKPOINTS)),
+                vol.Optional("all_conversions", default=False): bool,
                 vol.Optional("update_interval", default=10): vol.Coerce(int),
+                vol.Optional("incremental", default=False): bool,
+                vol.Optional("nearest_count", default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional("outlier_rejection", default=False): bool,
+
+                # Adaptive polling and API-point budget (0 = unlimited)
+                vol.Optional("adaptive", default=False): bool,
+                vol.Optional("point_budget", default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional("budget_period", default="day"): vol.In(["day", "month"]),
+
+                # HTTP transport, shared by all entries (taken from the first one loaded)
+                vol.Optional("transport", default="dedicated"): vol.In(["dedicated", "shared"]),
+                vol.Optional("pool_size", default=4): vol.All(vol.Coerce(int), vol.Range(min=1, max=32)),
+                vol.Optional("offload", default="thread"): vol.In(OFFLOAD_MODES),
+
+                # Comma-separated device addresses to poll on the LAN instead of the API
+                vol.Optional("local_hosts", default=""): str,
+
+                # Accept uploads from devices' "custom data processor" setting
+                vol.Optional("push", default=False): bool,
+
+                # Hourly mean/min/max of every contributing sensor as long-term statistics
+                vol.Optional("sensor_statistics", default=False): bool,
+
+                # Days of hourly history to fetch for the contributing sensors (0 = off)
+                vol.Optional("backfill_days", default=0): vol.All(vol.Coerce(int), vol.Range(min=0, max=90)),
+
+                # Points of interest to estimate an AQI for: "name: lat, lon; ..."
+                vol.Optional("zones", default=""): str,
+                vol.Optional("interpolation", default="idw"): vol.In(list(METHODS)),
 
                 # Optional for private sensors when device_search=False
                 vol.Optional("sensor_index"): vol.Coerce(int),
                 vol.Optional("read_key"): str,
+
+                # More sensors for device_search=False: "index[:read_key], ..."
+                vol.Optional("sensors", default=""): str,
             }
         )
 
-        return self.async_show_form(step_id="user", data_schema=STEP_SCHEMA)
+        return self.async_show_form(step_id="user", data_schema=STEP_SCHEMA, errors=errors)
 
 
 class PurpleAirOptionsFlow(config_entries.OptionsFlow):
@@ -84,8 +148,15 @@ class PurpleAirOptionsFlow(config_entries.OptionsFlow):
         """Edit options that should remain user-changeable."""
         entry = self._entry
         current = entry.data
+        errors: dict[str, str] = {}
 
         if user_input is not None:
+            try:
+                parse_zones(user_input.get("zones"))
+            except ValueError:
+                errors["zones"] = "invalid_zones"
+
+        if user_input is not None and not errors:
             #
             # Merge updated option data back into entry.data
             # (We don't use entry.options because we want a single source of truth)
@@ -120,11 +191,81 @@ class PurpleAirOptionsFlow(config_entries.OptionsFlow):
                     default=current.get("conversion", "US EPA"),
                 ): vol.In(CONVERSION_OPTIONS),
 
+                vol.Optional(
+                    "aqi_breakpoints",
+                    default=current.get("aqi_breakpoints", "EPA 2012"),
+                ): vol.In(list(BREAKPOINTS)),
+
+                vol.Optional(
+                    "all_conversions",
+                    default=current.get("all_conversions", False),
+                ): bool,
+
                 vol.Optional(
                     "update_interval",
                     default=current.get("update_interval", 10),
                 ): vol.Coerce(int),
+
+                vol.Optional(
+                    "incremental",
+                    default=current.get("incremental", False),
+                ): bool,
+
+                vol.Optional(
+                    "nearest_count",
+                    default=current.get("nearest_count", 0),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+
+                vol.Optional(
+                    "outlier_rejection",
+                    default=current.get("outlier_rejection", False),
+                ): bool,
+
+                vol.Optional(
+                    "local_hosts",
+                    default=current.get("local_hosts", ""),
+                ): str,
+
+                vol.Optional(
+                    "push",
+                    default=current.get("push", False),
+                ): bool,
+
+                vol.Optional(
+                    "sensor_statistics",
+                    default=current.get("sensor_statistics", False),
+                ): bool,
+
+                vol.Optional(
+                    "backfill_days",
+                    default=current.get("backfill_days", 0),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=90)),
+
+                vol.Optional(
+                    "zones",
+                    default=current.get("zones", ""),
+                ): str,
+
+                vol.Optional(
+                    "interpolation",
+                    default=current.get("interpolation", "idw"),
+                ): vol.In(list(METHODS)),
+
+                vol.Optional(
+                    "adaptive",
+                    default=current.get("adaptive", False),
+                ): bool,
+
+                vol.Optional(
+                    "point_budget",
+                    default=current.get("point_budget", 0),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+
+                vol.Optional(
+                    "budget_period",
+                    default=current.get("budget_period", "day"),
+                ): vol.In(["day", "month"]),
             }
         )
 
-        return self.async_show_form(step_id="options", data_schema=OPTIONS_SCHEMA)
+        return self.async_show_form(step_id="options", data_schema=OPTIONS_SCHEMA, errors=errors)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from dataclasses import asdict
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY, CONF_LATITUDE, CONF_LONGITUDE
+from homeassistant.core import HomeAssistant
+
+from . import DOMAIN
+from .api import PurpleAirClient
+from .lan import PurpleAirLanFeed
+
+TO_REDACT = {CONF_API_KEY, "read_key", CONF_LATITUDE, CONF_LONGITUDE, "webhook_id"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Per-poll timings, sizes and state to tune interval, radius and fields."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    client = data["client"]
+    scheduler = data["scheduler"]
+    feed = client.feed
+    result = data["coordinator"].data
+    push = data.get("push")
+    history = data.get("history")
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "last_poll": asdict(client.last_stats),
+        "last_result": asdict(result) if result else None,
+        "feed": {
+            "params": async_redact_data(
+                {k: v for k, v in feed.params.items() if k not in ("nwlat", "nwlng", "selat", "selng")},
+                TO_REDACT,
+            ),
+            "incremental_rows": len(feed.table.rows) if feed.table is not None else None,
+            "metadata_sensors": len(feed.metadata.sensors),
+            "circuit_open": feed.breaker.is_open,
+            "consecutive_failures": feed.breaker.failures,
+            "unreachable_hosts": feed.failed if isinstance(feed, PurpleAirLanFeed) else None,
+        },
+        "push": {
+            "active": push.active,
+            "last_push": push.last_push,
+            "devices": push.devices,
+        }
+        if push is not None
+        else None,
+        "nowcast": _nowcast_state(client),
+        "history": (
+            await hass.async_add_executor_job(history.summary) if history is not None else None
+        ),
+        "scheduler": {
+            "adaptive": scheduler.adaptive,
+            "base_minutes": scheduler.base_minutes,
+            "interval_minutes": scheduler.interval_minutes,
+            "effective_minutes": scheduler.effective_minutes,
+            "cost_per_poll": scheduler.cost_per_poll,
+            "spent": scheduler.spent,
+            "budget": scheduler.budget,
+            "period": scheduler.period,
+            "projected_points": scheduler.projected_points,
+        },
+    }
+
+
+def _nowcast_state(client: PurpleAirClient) -> dict[str, Any]:
+    """Each tracked sensor's NowCast and 12-hour mean concentration."""
+    history = client.history
+    now = time.time()
+    with history.lock:
+        return {
+            str(key): {
+                "nowcast": history.nowcast(key, now),
+                "mean_12h": history.mean(key, now),
+            }
+            for key in history.keys()
+        }
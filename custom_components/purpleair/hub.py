@@ -0,0 +1,164 @@
+# custom_components/purpleair/hub.py
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .api import PurpleAirClient, PurpleAirFeed, PurpleAirResult, box_query
+
+_LOGGER = logging.getLogger(__name__)
+
+# Two search boxes are served by one request when their combined bounding box
+# is no larger than this multiple of their summed areas.  Beyond that the
+# extra rows in the gap between them cost more than the saved call.
+MERGE_SLACK = 1.5
+
+Box = Tuple[float, float, float, float]  # (nwlat, nwlng, selat, selng)
+
+
+class PurpleAirHub:
+    """Serve every configured location from as few upstream calls as possible.
+
+    Search-mode clients sharing an API key are grouped by bounding box.  Each
+    group gets one PurpleAirFeed covering the union of its boxes; when any
+    member polls, the rows are split back out to every member and pushed to
+    the others, so all coordinators in the group stay aligned on one fetch
+    per interval.  Fan-outs still running when one of their members leaves
+    are cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._members: Dict[PurpleAirClient, Callable[[PurpleAirResult], None]] = {}
+        # Running fan-outs, each with the cluster it serves
+        self._fan_outs: Dict[asyncio.Task, List[PurpleAirClient]] = {}
+
+    @property
+    def clients(self) -> List[PurpleAirClient]:
+        return list(self._members)
+
+    def register(
+        self, client: PurpleAirClient, push: Callable[[PurpleAirResult], None]
+    ) -> None:
+        self._members[client] = push
+        self._rebuild()
+
+    def unregister(self, client: PurpleAirClient) -> None:
+        self._members.pop(client, None)
+        for task, cluster in list(self._fan_outs.items()):
+            if client in cluster:
+                task.cancel()
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        groups: Dict[str, List[PurpleAirClient]] = {}
+        for client in self._members:
+            # Start from a private feed; merged groups replace it below.
+            # Sensor metadata carries over so regrouping costs no requests.
+            metadata = client.feed.metadata
+            client.feed = client.make_feed()
+            client.feed.metadata.absorb(metadata)
+            if client.bounding_box() is not None:
+                groups.setdefault(client.config.api_key, []).append(client)
+
+        for api_key, clients in groups.items():
+            for cluster in cluster_boxes(clients):
+                if len(cluster) < 2:
+                    continue
+                self._share_feed(api_key, cluster)
+
+    def _share_feed(self, api_key: str, cluster: List[PurpleAirClient]) -> None:
+        box = union_box([c.bounding_box() for c in cluster])
+        fields: List[str] = []
+        for client in cluster:
+            for field in client.fields:
+                if field not in fields:
+                    fields.append(field)
+
+        feed = PurpleAirFeed(
+            cluster[0].transport,
+            api_key,
+            box_query(fields, box),
+            incremental=all(c.config.incremental for c in cluster),
+            offloader=cluster[0].offloader,
+        )
+        feed.add_listener(
+            lambda payload, requester: self._start_fan_out(cluster, payload, requester)
+        )
+        for client in cluster:
+            feed.metadata.absorb(client.feed.metadata)
+            client.feed = feed
+
+        _LOGGER.debug(
+            "Serving %d PurpleAir locations from one request: %s", len(cluster), box
+        )
+
+    def _start_fan_out(
+        self, cluster: List[PurpleAirClient], payload: Dict[str, Any], requester: Any
+    ) -> None:
+        # Held here until done: the loop only keeps weak references to tasks
+        task = asyncio.ensure_future(self._fan_out(cluster, payload, requester))
+        self._fan_outs[task] = cluster
+        task.add_done_callback(lambda done: self._fan_outs.pop(done, None))
+
+    async def _fan_out(
+        self, cluster: List[PurpleAirClient], payload: Dict[str, Any], requester: Any
+    ) -> None:
+        for client in cluster:
+            if client is requester or client not in self._members:
+                continue
+            try:
+                result = await client.async_process(payload)
+            except Exception as err:  # one location's failure shouldn't block the rest
+                _LOGGER.debug("No shared PurpleAir result for %s: %s", client.config.search_coords, err)
+                continue
+            if client in self._members:
+                self._members[client](result)
+
+
+def box_area(box: Box) -> float:
+    nwlat, nwlng, selat, selng = box
+    return max(nwlat - selat, 0.0) * max(selng - nwlng, 0.0)
+
+
+def union_box(boxes: List[Optional[Box]]) -> Box:
+    real = [b for b in boxes if b is not None]
+    return (
+        max(b[0] for b in real),
+        min(b[1] for b in real),
+        min(b[2] for b in real),
+        max(b[3] for b in real),
+    )
+
+
+def cluster_boxes(clients: List[PurpleAirClient]) -> List[List[PurpleAirClient]]:
+    """Greedily merge clients whose boxes are cheap to fetch together."""
+    clusters: List[Tuple[Box, float, List[PurpleAirClient]]] = [
+        (c.bounding_box(), box_area(c.bounding_box()), [c]) for c in clients
+    ]
+
+    merged = True
+    while merged and len(clusters) > 1:
+        merged = False
+        best: Optional[Tuple[float, int, int]] = None
+        for i in range(len(clusters)):
+            for j in range(i + 1, len(clusters)):
+                box_i, area_i, _ = clusters[i]
+                box_j, area_j, _ = clusters[j]
+                combined = box_area(union_box([box_i, box_j]))
+                if combined > MERGE_SLACK * (area_i + area_j):
+                    continue
+                ratio = combined / max(area_i + area_j, 1e-12)
+                if best is None or ratio < best[0]:
+                    best = (ratio, i, j)
+
+        if best is not None:
+            _, i, j = best
+            box_i, area_i, members_i = clusters[i]
+            box_j, area_j, members_j = clusters[j]
+            clusters[i] = (union_box([box_i, box_j]), area_i + area_j, members_i + members_j)
+            del clusters[j]
+            merged = True
+
+    return [members for _, _, members in clusters]
@@ -0,0 +1,144 @@
+# custom_components/purpleair/interpolate.py
+
+from __future__ import annotations
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import columnar
+from .spatial import distance
+
+IDW_POWER = 2.0
+MIN_DISTANCE = 0.001  # miles; a sensor on the spot must not divide by zero
+MIN_RANGE = 0.1  # miles; variogram range floor for tightly clustered sensors
+METHODS = ("idw", "kriging")
+
+EARTH_RADIUS_MILES = 6371.0 / 1.609  # the radius spatial.distance() works with
+
+Zone = Tuple[str, float, float]  # name, latitude, longitude
+
+
+class ZoneInterpolator:
+    """PM2.5 estimates for several points of interest from one set of sensors.
+
+    Each zone's estimate is a weighted sum of the sensors' readings, and the
+    weights depend only on where sensors and zones are.  They are worked out
+    for every zone at once, as a zones x sensors matrix (with NumPy when
+    available), and cached for the sensor set, so a poll that sees the
+    same sensors as the previous one costs one matrix-vector product.
+
+    ``idw`` weights by inverse squared distance.  ``kriging`` is ordinary
+    kriging with an exponential variogram whose range is half the widest
+    sensor spread; without a nugget its weights do not depend on the sill,
+    so they are cached just the same.  Kriging needs NumPy, three sensors
+    and distinct sensor positions, and falls back to IDW otherwise.
+    """
+
+    def __init__(self, zones: List[Zone], method: str = "idw") -> None:
+        self.zones = list(zones)
+        self.method = method if method in METHODS else "idw"
+        self._cache_key: Optional[Tuple[Any, ...]] = None
+        self._weights: Any = None
+
+    def estimate(
+        self, keys: List[Any], coords: List[Tuple[float, float]], values: List[float]
+    ) -> Dict[str, float]:
+        """Zone name -> estimated PM2.5; ``coords`` and ``values`` align with ``keys``."""
+        if not keys or not self.zones:
+            return {}
+
+        cache_key = (tuple(keys), tuple(coords))
+        if cache_key != self._cache_key:
+            self._weights = self._compute_weights(coords)
+            self._cache_key = cache_key
+
+        if columnar.HAS_NUMPY:
+            estimates = (self._weights @ columnar.np.asarray(values, dtype=float)).tolist()
+        else:
+            estimates = [sum(w * v for w, v in zip(row, values)) for row in self._weights]
+        # Kriging weights may be negative; a concentration may not
+        return {zone[0]: max(pm, 0.0) for zone, pm in zip(self.zones, estimates)}
+
+    def _compute_weights(self, coords: List[Tuple[float, float]]) -> Any:
+        if not columnar.HAS_NUMPY:
+            rows = []
+            for _, lat, lon in self.zones:
+                raw = [
+                    1.0 / max(distance((lat, lon), point), MIN_DISTANCE) ** IDW_POWER
+                    for point in coords
+                ]
+                total = sum(raw)
+                rows.append([w / total for w in raw])
+            return rows
+
+        np = columnar.np
+        sensors = np.asarray(coords, dtype=float)
+        zones = np.asarray([(lat, lon) for _, lat, lon in self.zones], dtype=float)
+        to_zones = distance_matrix(zones, sensors)
+
+        if self.method == "kriging" and len(coords) >= 3:
+            weights = _kriging_weights(distance_matrix(sensors, sensors), to_zones)
+            if weights is not None:
+                return weights
+
+        raw = 1.0 / np.maximum(to_zones, MIN_DISTANCE) ** IDW_POWER
+        return raw / raw.sum(axis=1, keepdims=True)
+
+
+def _kriging_weights(between: Any, to_zones: Any) -> Any:
+    """Ordinary kriging weights (zones x sensors), or None for a singular system."""
+    np = columnar.np
+    n = between.shape[0]
+    spread = max(float(between.max()) / 2, MIN_RANGE)
+
+    system = np.ones((n + 1, n + 1))
+    system[:n, :n] = 1.0 - np.exp(-3.0 * between / spread)
+    system[n, n] = 0.0
+    targets = np.ones((n + 1, to_zones.shape[0]))
+    targets[:n] = (1.0 - np.exp(-3.0 * to_zones / spread)).T
+    try:
+        solved = np.linalg.solve(system, targets)
+    except np.linalg.LinAlgError:
+        return None
+    return solved[:n].T
+
+
+def distance_matrix(a: Any, b: Any) -> Any:
+    """Haversine miles between every row of ``a`` and of ``b`` ((lat, lon) arrays)."""
+    np = columnar.np
+    lat1 = np.radians(a[:, 0])[:, None]
+    lat2 = np.radians(b[:, 0])[None, :]
+    dphi = lat2 - lat1
+    dlambda = np.radians(b[:, 1])[None, :] - np.radians(a[:, 1])[:, None]
+    h = np.sin(dphi / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arctan2(np.sqrt(h), np.sqrt(1 - h))
+
+
+def parse_zones(value: Optional[str]) -> List[Zone]:
+    """Parse the ``zones`` option: ``name: lat, lon`` entries separated by ``;``.
+
+    Raises ValueError on a malformed entry or a repeated name, including
+    names that only differ in what zone_slug() drops ("Home" and "home!").
+    """
+    zones: List[Zone] = []
+    for entry in (value or "").split(";"):
+        if not entry.strip():
+            continue
+        name, sep, position = entry.partition(":")
+        lat, _, lon = position.partition(",")
+        name = name.strip()
+        slug = zone_slug(name)
+        if not sep or not slug or any(slug == zone_slug(zone[0]) for zone in zones):
+            raise ValueError(f"Bad zone: {entry.strip()}")
+        lat_deg, lon_deg = float(lat), float(lon)
+        if not (-90 <= lat_deg <= 90 and -180 <= lon_deg <= 180) or math.isnan(lat_deg + lon_deg):
+            raise ValueError(f"Bad zone position: {entry.strip()}")
+        zones.append((name, lat_deg, lon_deg))
+    return zones
+
+
+def zone_slug(name: str) -> str:
+    """A zone name as used in its entity's unique id: runs of anything but
+    letters and digits become one underscore, and edges are trimmed."""
+    return re.sub(r"[\W_]+", "_", name.lower()).strip("_")
@@ -0,0 +1,175 @@
+# custom_components/purpleair/lan.py
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .api import AB_MAX_DIFF, AB_MAX_RPD, METADATA_FIELDS, PurpleAirFeedBase, SensorMetadata
+from .resilience import PurpleAirError, PurpleAirHTTPError
+from .transport import PurpleAirTransport, RequestTiming
+
+_LOGGER = logging.getLogger(__name__)
+
+DEVICE_TIMEOUT = 5.0  # seconds per device; a slow unit must not hold up the rest
+MAX_PARALLEL = 8
+
+# What an unreachable or misbehaving device can raise; anything else is a bug
+DEVICE_ERRORS = (PurpleAirError, aiohttp.ClientError, asyncio.TimeoutError, ValueError)
+
+# Columns of the payload built from device readings; the same names the
+# cloud API uses, so PurpleAirClient processes both alike
+LAN_FIELDS = [
+    "sensor_index",
+    "confidence",
+    "pm2.5",
+    "pm2.5_cf_1",
+    "humidity",
+    "pm2.5_a",
+    "pm2.5_b",
+]
+
+# Devices report no position rating; treat them like a well-sited outdoor unit
+LAN_POSITION_RATING = 5
+
+
+class PurpleAirLanFeed(PurpleAirFeedBase):
+    """Poll PurpleAir units on the local network instead of the cloud API.
+
+    Every device's ``/json`` endpoint is fetched concurrently (at most
+    MAX_PARALLEL at a time, over the shared pooled transport), each with its
+    own DEVICE_TIMEOUT.  The readings become a /v1/sensors-style payload
+    and the devices' names and coordinates fill the MetadataCache, so the
+    client averages, weights and converts them exactly like cloud rows.
+
+    Devices that fail are skipped for that poll (and listed in ``failed``);
+    only when none answers does the poll fail.  Costs no API points.
+    """
+
+    def __init__(self, transport: PurpleAirTransport, hosts: List[str]) -> None:
+        super().__init__()
+        self._transport = transport
+        self.hosts = list(hosts)
+        self.params: Dict[str, Any] = {"hosts": ",".join(self.hosts)}
+        self.table = None
+        self.failed: List[str] = []  # hosts that did not answer the last poll
+        self._semaphore = asyncio.Semaphore(MAX_PARALLEL)
+
+    async def _poll(self) -> Dict[str, Any]:
+        self.breaker.check()
+        results = await asyncio.gather(
+            *(self._fetch_device(host) for host in self.hosts), return_exceptions=True
+        )
+
+        rows: List[List[Any]] = []
+        changed: List[List[Any]] = []
+        failed = []
+        for host, result in zip(self.hosts, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, DEVICE_ERRORS):
+                    raise result
+                _LOGGER.debug("PurpleAir device %s failed: %s", host, result)
+                failed.append(host)
+                continue
+            row, meta = device_row(result, host)
+            rows.append(row)
+            if self.metadata.get(meta[0]) != device_metadata(meta):
+                changed.append(meta)
+        self.failed = failed
+
+        if not rows:
+            self.breaker.failure()
+            raise PurpleAirError(f"No PurpleAir device answered ({', '.join(self.failed)})")
+        self.breaker.success()
+
+        if changed:
+            self.metadata.merge({"fields": ["sensor_index", *METADATA_FIELDS], "data": changed})
+        self.metadata.refreshed_at = time.time()
+        return {"fields": LAN_FIELDS, "data": rows, "time_stamp": int(time.time())}
+
+    async def _fetch_device(self, host: str) -> Dict[str, Any]:
+        timing = RequestTiming()
+        async with self._semaphore:
+            async with self._transport.get(
+                f"http://{host}/json",
+                timeout=aiohttp.ClientTimeout(total=DEVICE_TIMEOUT),
+                timing=timing,
+            ) as resp:
+                if resp.status != 200:
+                    raise PurpleAirHTTPError(resp.status, await resp.text())
+                raw = await resp.read()
+
+        start = time.perf_counter()
+        payload = json.loads(raw)
+        self._stats.add_request(timing, time.perf_counter() - start, len(raw), 0)
+        return payload
+
+
+def device_row(payload: Dict[str, Any], host: str) -> Tuple[List[Any], List[Any]]:
+    """One device's /json payload as a (LAN_FIELDS row, metadata row) pair.
+
+    Dual-laser units report channel B with a ``_b`` suffix.  Without a cloud
+    confidence score, a unit whose channels disagree (the same rule as the
+    outlier filter) gets confidence 0, otherwise 100.
+    """
+    key = payload.get("SensorId") or host
+    atm_a = _float(payload.get("pm2_5_atm"))
+    atm_b = _float(payload.get("pm2_5_atm_b"))
+    cf1_a = _float(payload.get("pm2_5_cf_1"))
+    cf1_b = _float(payload.get("pm2_5_cf_1_b"))
+
+    confidence = 100
+    if atm_a is not None and atm_b is not None:
+        diff = abs(atm_a - atm_b)
+        if diff > AB_MAX_DIFF and (atm_a + atm_b <= 0 or 2 * diff / (atm_a + atm_b) > AB_MAX_RPD):
+            confidence = 0
+
+    row = [
+        key,
+        confidence,
+        _mean(atm_a, atm_b),
+        _mean(cf1_a, cf1_b),
+        _float(payload.get("current_humidity")),
+        atm_a,
+        atm_b,
+    ]
+    meta = [
+        key,
+        payload.get("Geo") or host,
+        _float(payload.get("lat")),
+        _float(payload.get("lon")),
+        LAN_POSITION_RATING,
+    ]
+    return row, meta
+
+
+def device_metadata(meta: List[Any]) -> SensorMetadata:
+    """device_row() metadata as cached; merge only changed ones, as merging drops distances."""
+    return SensorMetadata(
+        name=meta[1], latitude=meta[2], longitude=meta[3], position_rating=meta[4]
+    )
+
+
+def parse_hosts(value: Optional[str]) -> List[str]:
+    """Split the comma-separated ``local_hosts`` option."""
+    return [host.strip() for host in (value or "").split(",") if host.strip()]
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _mean(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (a + b) / 2
@@ -0,0 +1,73 @@
+# custom_components/purpleair/longterm.py
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Tuple
+
+from homeassistant.util import slugify
+
+# (hour number, mean, min, max)
+HourStats = Tuple[int, float, float, float]
+
+
+class HourlyBuckets:
+    """Hourly mean/min/max of each contributing sensor, held until flushed.
+
+    Every processed reading lands in its sensor's open bucket (O(1), no
+    per-reading storage).  A bucket closes when a reading from a later hour
+    arrives or flush() passes its hour; flush() hands back all closed
+    buckets at once, to be written as one batch of long-term statistics.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._open: Dict[Any, List[float]] = {}  # key -> [hour, n, sum, min, max]
+        self._closed: Dict[Any, List[HourStats]] = {}
+        self.names: Dict[Any, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def add(self, key: Any, name: str, value: float, stamp: float) -> None:
+        hour = int(stamp // 3600)
+        with self._lock:
+            self.names[key] = name
+            bucket = self._open.get(key)
+            if bucket is not None and bucket[0] == hour:
+                bucket[1] += 1
+                bucket[2] += value
+                if value < bucket[3]:
+                    bucket[3] = value
+                if value > bucket[4]:
+                    bucket[4] = value
+                return
+            if bucket is not None:
+                if hour < bucket[0]:
+                    return  # older than the open hour
+                self._close(key, bucket)
+            self._open[key] = [hour, 1, value, value, value]
+
+    def flush(self, stamp: float) -> Dict[Any, List[HourStats]]:
+        """Close the buckets of hours before ``stamp`` and return every closed one."""
+        hour = int(stamp // 3600)
+        with self._lock:
+            for key, bucket in list(self._open.items()):
+                if bucket[0] < hour:
+                    self._close(key, bucket)
+                    del self._open[key]
+            closed, self._closed = self._closed, {}
+        return closed
+
+    def _close(self, key: Any, bucket: List[float]) -> None:
+        hour, n, total, low, high = bucket
+        self._closed.setdefault(key, []).append((int(hour), total / n, low, high))
+
+
+def statistic_slug(key: Any) -> str:
+    """A sensor key as the object id part of a statistic id.
+
+    slugify() collapses and trims the underscores that statistic ids must
+    not repeat or start/end with (e.g. for an IPv6 host key).
+    """
+    return slugify(str(key), separator="_")
@@ -0,0 +1,283 @@
+# custom_components/purpleair/nowcast.py
+
+from __future__ import annotations
+
+import base64
+import math
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+from . import columnar
+
+HOURS = 12  # NowCast window
+MIN_RECENT = 2  # valid hours required among the 3 most recent
+MIN_WEIGHT = 0.5  # EPA floor for the PM weight factor
+
+_NAN = float("nan")
+
+# Fixed-size typecodes, so saved columns can be read back
+_COLUMNS = {
+    "hourly": "d",
+    "hour_sum": "d",
+    "hour_n": "q",
+    "last_hour": "q",
+    "window_sum": "d",
+    "window_n": "q",
+}
+
+
+class NowCastHistory:
+    """Hourly PM2.5 history per sensor for EPA NowCast and rolling means.
+
+    Each sensor owns one row of flat ``array`` columns: a ring of HOURS
+    hourly means plus the running sum and count of the current hour and of
+    the window.  A sample only touches its own hour's slot (and clears the
+    slots of any hours skipped since the last one, at most HOURS), so adding
+    one is O(1); NowCast reads a fixed HOURS values.  Rows of sensors that
+    have been silent for a whole window are recycled.
+    """
+
+    def __init__(self) -> None:
+        self._rows: Dict[Any, int] = {}
+        self._free: List[int] = []
+        self._hourly = array("d")  # HOURS hourly means per row, NaN = no data
+        self._hour_sum = array("d")
+        self._hour_n = array("q")
+        self._last_hour = array("q")  # hour number of the row's latest sample
+        self._window_sum = array("d")  # sum of the valid hourly means
+        self._window_n = array("q")
+        self._pruned_hour: Optional[int] = None
+        self.lock = threading.Lock()  # processing runs on the offloader's threads
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._rows
+
+    def keys(self) -> List[Any]:
+        return list(self._rows)
+
+    def add(self, key: Any, value: float, stamp: float) -> None:
+        """Record one reading taken at ``stamp`` (epoch seconds)."""
+        hour = int(stamp // 3600)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._allocate(key, hour)
+        elif hour < self._last_hour[row]:
+            return  # older than what we already have
+        else:
+            self._advance(row, hour)
+
+        slot = row * HOURS + hour % HOURS
+        old = self._hourly[slot]
+        if old == old:
+            self._window_sum[row] -= old
+            self._window_n[row] -= 1
+
+        self._hour_sum[row] += value
+        self._hour_n[row] += 1
+        mean = self._hour_sum[row] / self._hour_n[row]
+        self._hourly[slot] = mean
+        self._window_sum[row] += mean
+        self._window_n[row] += 1
+
+    def fill(self, key: Any, mean: float, stamp: float) -> None:
+        """Set a past hour's mean from backfilled data, unless it already has one.
+
+        Hours at or after the row's latest sample are recorded like add().
+        """
+        hour = int(stamp // 3600)
+        row = self._rows.get(key)
+        if row is None or hour > self._last_hour[row]:
+            self.add(key, mean, stamp)
+            return
+        last = self._last_hour[row]
+        if hour == last or last - hour >= HOURS:
+            return  # the live hour, or outside the window
+
+        slot = row * HOURS + hour % HOURS
+        if self._hourly[slot] == self._hourly[slot]:
+            return
+        self._hourly[slot] = mean
+        self._window_sum[row] += mean
+        self._window_n[row] += 1
+
+    def hourly(self, key: Any, stamp: float) -> List[Optional[float]]:
+        """Hourly means, most recent (current, partial) hour first."""
+        row = self._rows.get(key)
+        if row is None:
+            return [None] * HOURS
+        hour = int(stamp // 3600)
+        self._advance(row, hour)
+        base = row * HOURS
+        values: List[Optional[float]] = []
+        for age in range(HOURS):
+            value = self._hourly[base + (hour - age) % HOURS]
+            values.append(value if value == value else None)
+        return values
+
+    def mean(self, key: Any, stamp: float) -> Optional[float]:
+        """Mean of the hourly means over the window (shown in diagnostics)."""
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        self._advance(row, int(stamp // 3600))
+        n = self._window_n[row]
+        return self._window_sum[row] / n if n else None
+
+    def nowcast(self, key: Any, stamp: float) -> Optional[float]:
+        """EPA NowCast concentration, or None without enough recent hours."""
+        return nowcast(self.hourly(key, stamp))
+
+    def nowcast_column(self, keys: List[Any], stamp: float) -> "columnar.np.ndarray":
+        """nowcast() for many keys at once, NaN where there is none; needs NumPy."""
+        np = columnar.np
+        hour = int(stamp // 3600)
+        rows = []
+        for key in keys:
+            row = self._rows.get(key, -1)
+            if row >= 0:
+                self._advance(row, hour)
+            rows.append(row)
+        if not self._rows:
+            return np.full(len(keys), np.nan)
+
+        rows = np.asarray(rows, dtype=np.intp)
+        order = (hour - np.arange(HOURS)) % HOURS  # most recent hour first
+        ring = np.frombuffer(self._hourly, dtype=float).reshape(-1, HOURS)
+        hourly = ring[np.maximum(rows, 0)[:, None], order]
+        del ring  # release the buffer so the array can grow again
+        hourly[rows < 0] = np.nan
+        return nowcast_rows(hourly)
+
+    def prune(self, stamp: float) -> None:
+        """Recycle rows of sensors not heard from for a whole window (hourly)."""
+        hour = int(stamp // 3600)
+        if self._pruned_hour == hour:
+            return
+        self._pruned_hour = hour
+        for key, row in list(self._rows.items()):
+            if hour - self._last_hour[row] >= HOURS:
+                del self._rows[key]
+                self._free.append(row)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Compact JSON-able form: row map plus base64 array columns."""
+        return {
+            "rows": [[key, row] for key, row in self._rows.items()],
+            "free": list(self._free),
+            "columns": {
+                name: base64.b64encode(getattr(self, f"_{name}").tobytes()).decode()
+                for name in _COLUMNS
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NowCastHistory":
+        """Inverse of as_dict(); raises ValueError on inconsistent data."""
+        history = cls()
+        for name, typecode in _COLUMNS.items():
+            column = array(typecode)
+            column.frombytes(base64.b64decode(data["columns"][name]))
+            setattr(history, f"_{name}", column)
+
+        size = len(history._last_hour)
+        if len(history._hourly) != size * HOURS or any(
+            len(getattr(history, f"_{name}")) != size for name in _COLUMNS if name != "hourly"
+        ):
+            raise ValueError("NowCast history columns do not line up")
+        history._rows = {key: row for key, row in data["rows"]}
+        history._free = list(data["free"])
+        if any(not 0 <= row < size for row in [*history._rows.values(), *history._free]):
+            raise ValueError("NowCast history row out of range")
+        return history
+
+    def _allocate(self, key: Any, hour: int) -> int:
+        if self._free:
+            row = self._free.pop()
+            base = row * HOURS
+            for slot in range(base, base + HOURS):
+                self._hourly[slot] = _NAN
+            self._hour_sum[row] = 0.0
+            self._hour_n[row] = 0
+            self._last_hour[row] = hour
+            self._window_sum[row] = 0.0
+            self._window_n[row] = 0
+        else:
+            row = len(self._last_hour)
+            self._hourly.extend([_NAN] * HOURS)
+            self._hour_sum.append(0.0)
+            self._hour_n.append(0)
+            self._last_hour.append(hour)
+            self._window_sum.append(0.0)
+            self._window_n.append(0)
+        self._rows[key] = row
+        return row
+
+    def _advance(self, row: int, hour: int) -> None:
+        """Move the row's current hour forward, clearing the hours in between."""
+        last = self._last_hour[row]
+        if hour <= last:
+            return
+        base = row * HOURS
+        for h in range(max(last + 1, hour - HOURS + 1), hour + 1):
+            slot = base + h % HOURS
+            old = self._hourly[slot]
+            if old == old:
+                self._window_sum[row] -= old
+                self._window_n[row] -= 1
+            self._hourly[slot] = _NAN
+        if not self._window_n[row]:
+            self._window_sum[row] = 0.0  # drop accumulated rounding error
+        self._hour_sum[row] = 0.0
+        self._hour_n[row] = 0
+        self._last_hour[row] = hour
+
+
+def nowcast_rows(hourly: "columnar.np.ndarray") -> "columnar.np.ndarray":
+    """nowcast() over each row of a (sensors x HOURS) array, NaN for missing."""
+    np = columnar.np
+    valid = ~np.isnan(hourly)
+    enough = valid[:, :3].sum(axis=1) >= MIN_RECENT
+    high = np.fmax.reduce(hourly, axis=1)  # fmax/fmin skip NaN
+    low = np.fmin.reduce(hourly, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = np.where(high > 0, np.maximum(low / high, MIN_WEIGHT), 1.0)
+        numerator = np.zeros(len(hourly))
+        denominator = np.zeros(len(hourly))
+        factor = np.ones(len(hourly))
+        for age in range(HOURS):
+            ok = valid[:, age]
+            numerator += np.where(ok, factor * hourly[:, age], 0.0)
+            denominator += np.where(ok, factor, 0.0)
+            factor *= weight
+        result = numerator / denominator
+    return np.where(enough & np.isfinite(result), result, np.nan)
+
+
+def nowcast(hourly: List[Optional[float]]) -> Optional[float]:
+    """EPA NowCast for PM from hourly means, most recent first.
+
+    Missing hours (None) are skipped but keep their position in the weight
+    sequence.
+    """
+    if sum(1 for value in hourly[:3] if value is not None) < MIN_RECENT:
+        return None
+
+    valid = [value for value in hourly if value is not None]
+    high = max(valid)
+    low = min(valid)
+    weight = max(low / high, MIN_WEIGHT) if high > 0 else 1.0
+
+    numerator = 0.0
+    denominator = 0.0
+    factor = 1.0
+    for value in hourly:
+        if value is not None:
+            numerator += factor * value
+            denominator += factor
+        factor *= weight
+    result = numerator / denominator
+    return result if math.isfinite(result) else None
@@ -41,7 +41,7 @@ class PurpleAirUpdateIntervalNumber(CoordinatorEntity, NumberEntity):
     def device_info(self):
         return {
             "identifiers": {(DOMAIN, self.entry.entry_id)},
-            "name": "PurpleAir",
+            "name": self.entry.title,
         }
 
     @property
@@ -54,5 +54,9 @@ class PurpleAirUpdateIntervalNumber(CoordinatorEntity, NumberEntity):
         new_data = {**self.entry.data, "update_interval": minutes}
         self.hass.config_entries.async_update_entry(self.entry, data=new_data)
 
-        self.coordinator.update_interval = timedelta(minutes=minutes)
+        scheduler = self.hass.data[DOMAIN][self.entry.entry_id].get("scheduler")
+        if scheduler is not None:
+            self.coordinator.update_interval = scheduler.set_base(minutes)
+        else:
+            self.coordinator.update_interval = timedelta(minutes=minutes)
         await self.coordinator.async_request_refresh()
@@ -0,0 +1,85 @@
+# custom_components/purpleair/offload.py
+
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Responses smaller than this are decoded and processed inline; below it the
+# executor hand-off costs more than it saves.
+OFFLOAD_MIN_BYTES = 256 * 1024
+
+OFFLOAD_MODES = ["off", "thread", "process", "stream"]
+
+
+class Offloader:
+    """Move JSON decoding and aggregation of large responses off the event loop.
+
+    ``thread`` runs both in a small thread pool: aggregation is plain Python
+    (or NumPy, which releases the GIL), so the loop keeps getting time
+    slices.  ``process`` additionally decodes JSON in a worker process, which
+    also frees the interpreter from the C decoder at the cost of shipping the
+    decoded rows back.  ``stream`` never holds a whole body: feeds parse it
+    row by row as it arrives (see SensorStreamParser), so decoding happens on
+    the loop in small slices.  Aggregation always uses threads, because
+    clients are not picklable.
+    """
+
+    def __init__(
+        self, mode: str = "thread", min_bytes: int = OFFLOAD_MIN_BYTES, max_workers: int = 2
+    ) -> None:
+        self.mode = mode if mode in OFFLOAD_MODES else "off"
+        self.min_bytes = min_bytes
+        self.max_workers = max_workers
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def streaming(self) -> bool:
+        return self.mode == "stream"
+
+    def wants(self, size: int) -> bool:
+        return self.mode != "off" and size >= self.min_bytes
+
+    async def decode(self, raw: bytes) -> Any:
+        if not self.wants(len(raw)):
+            return json.loads(raw)
+        executor = self._process_pool() if self.mode == "process" else self._thread_pool()
+        return await asyncio.get_running_loop().run_in_executor(executor, json.loads, raw)
+
+    async def call(self, size: int, fn: Callable[..., T], *args: Any) -> T:
+        if not self.wants(size):
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._thread_pool(), fn, *args)
+
+    def shutdown(self) -> None:
+        """Stop the pools; blocking, so run it in an executor."""
+        for executor in (self._threads, self._processes):
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        self._threads = None
+        self._processes = None
+
+    def _thread_pool(self) -> Executor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="purpleair"
+            )
+        return self._threads
+
+    def _process_pool(self) -> Executor:
+        if self._processes is None:
+            # Never fork the (threaded) Home Assistant process itself
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context
+            )
+        return self._processes
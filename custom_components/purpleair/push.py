@@ -0,0 +1,104 @@
+# custom_components/purpleair/push.py
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .api import METADATA_FIELDS, MetadataCache, PollStats
+from .lan import LAN_FIELDS, device_metadata, device_row
+from .resilience import CircuitBreaker, PurpleAirError
+
+# Devices upload every 2 minutes by default; after this long without an
+# upload the integration goes back to polling the cloud API
+PUSH_MAX_AGE = 5 * 60  # seconds
+
+_PM25 = LAN_FIELDS.index("pm2.5")
+
+
+class PurpleAirPushFeed:
+    """Readings uploaded to our webhook by PurpleAir units.
+
+    A device's "custom data processor" setting POSTs the same JSON document
+    it serves at ``/json``.  accept() validates an upload and keeps it as
+    that device's latest row; the feed's payload holds every device heard
+    from within PUSH_MAX_AGE, in the LAN feed's format, so a PurpleAirClient
+    built on this feed averages and converts pushes like any other rows.
+
+    Costs no API points and needs no polling while uploads keep arriving.
+    """
+
+    def __init__(self, max_age: float = PUSH_MAX_AGE) -> None:
+        self.max_age = max_age
+        self.params: Dict[str, Any] = {"push": True}
+        self.table = None
+        self.metadata = MetadataCache()
+        self.last_stats = PollStats()
+        self.last_requester: Any = None
+        self.breaker = CircuitBreaker()
+        self.last_push: Optional[float] = None  # time.time() of the latest upload
+        self._changed = 0.0  # time.time() the set of rows last changed
+        self._rows: Dict[Any, Tuple[float, List[Any]]] = {}
+
+    @property
+    def last_points(self) -> int:
+        return 0
+
+    @property
+    def active(self) -> bool:
+        """Whether a device has uploaded recently enough to skip polling."""
+        return self.last_push is not None and time.time() - self.last_push < self.max_age
+
+    @property
+    def devices(self) -> int:
+        return len(self._rows)
+
+    def accept(self, data: Any, remote: str) -> Dict[str, Any]:
+        """Record one upload and return the resulting payload.
+
+        Raises ValueError for anything that is not a device reading.
+        """
+        if not isinstance(data, dict) or not data.get("SensorId"):
+            raise ValueError("Not a PurpleAir device upload")
+        row, meta = device_row(data, remote)
+        if row[_PM25] is None:
+            raise ValueError("Upload carries no PM2.5 reading")
+
+        now = time.time()
+        self._rows[row[0]] = (now, row)
+        self.last_push = now
+        self._changed = now
+
+        if self.metadata.get(row[0]) != device_metadata(meta):
+            self.metadata.merge({"fields": ["sensor_index", *METADATA_FIELDS], "data": [meta]})
+        self.metadata.refreshed_at = now
+
+        self.last_stats = PollStats()
+        self.last_requester = None
+        return self.payload()
+
+    def payload(self) -> Dict[str, Any]:
+        """The fresh uploads as a /v1/sensors-style payload.
+
+        Its data_time_stamp only moves when the rows do, so the client does
+        not record the same uploads again on every scheduled update.
+        """
+        now = time.time()
+        for key in [k for k, (seen, _) in self._rows.items() if now - seen >= self.max_age]:
+            del self._rows[key]
+            self._changed = now
+        return {
+            "fields": LAN_FIELDS,
+            "data": [row for _, row in self._rows.values()],
+            "time_stamp": int(now),
+            "data_time_stamp": self._changed,
+        }
+
+    async def async_fetch(self, requester: Any = None) -> Dict[str, Any]:
+        """The current payload; there is nothing to fetch."""
+        payload = self.payload()
+        if not payload["data"]:
+            raise PurpleAirError("No recent uploads from PurpleAir devices")
+        self.last_stats = PollStats()
+        self.last_requester = requester
+        return payload
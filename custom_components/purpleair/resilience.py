@@ -0,0 +1,101 @@
+# custom_components/purpleair/resilience.py
+
+from __future__ import annotations
+
+import random
+import time
+from typing import Optional
+
+# Per-request retries inside one poll
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_CAP = 10.0
+# A Retry-After longer than this is not slept through; the breaker opens instead
+RETRY_AFTER_MAX = 30.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class PurpleAirError(RuntimeError):
+    """The PurpleAir API could not be reached or refused the request."""
+
+
+class PurpleAirHTTPError(PurpleAirError):
+    def __init__(self, status: int, text: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(f"PurpleAir HTTP {status}: {text}")
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRYABLE_STATUS
+
+
+class CircuitOpenError(PurpleAirError):
+    def __init__(self, retry_in: float) -> None:
+        super().__init__(f"PurpleAir requests paused for {retry_in:.0f}s after repeated failures")
+        self.retry_in = retry_in
+
+
+def is_permanent(err: BaseException) -> bool:
+    """Whether the API refused the request for good (bad key, bad query)."""
+    return isinstance(err, PurpleAirHTTPError) and not err.retryable
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        # HTTP-date form; not worth parsing, fall back to our own backoff
+        return None
+
+
+class CircuitBreaker:
+    """Stop calling the API for a while after repeated failed polls.
+
+    After ``threshold`` consecutive failures (or any explicit Retry-After)
+    the circuit opens for ``cooldown`` seconds, doubling up to
+    ``max_cooldown`` while failures continue.  The first call after the
+    cooldown goes through as a trial; success closes the circuit again.
+    """
+
+    def __init__(
+        self, threshold: int = 3, cooldown: float = 60.0, max_cooldown: float = 1800.0
+    ) -> None:
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self._cooldown = cooldown
+        self._open_until = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.retry_in() > 0
+
+    def retry_in(self) -> float:
+        return max(self._open_until - time.monotonic(), 0.0)
+
+    def check(self) -> None:
+        remaining = self.retry_in()
+        if remaining > 0:
+            raise CircuitOpenError(remaining)
+
+    def success(self) -> None:
+        self.failures = 0
+        self._cooldown = self.base_cooldown
+        self._open_until = 0.0
+
+    def failure(self, retry_after: Optional[float] = None) -> None:
+        self.failures += 1
+        if self.failures < self.threshold and retry_after is None:
+            return
+        self._open_until = time.monotonic() + max(self._cooldown, retry_after or 0.0)
+        self._cooldown = min(self._cooldown * 2, self.max_cooldown)
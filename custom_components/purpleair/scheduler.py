@@ -0,0 +1,144 @@
+# custom_components/purpleair/scheduler.py
+
+from __future__ import annotations
+
+import calendar
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from .api import PurpleAirResult
+
+
+class AdaptiveScheduler:
+    """Pick the next polling interval from AQI volatility and an API-point budget.
+
+    With ``adaptive`` on, the interval halves (down to ``min_minutes``) when
+    the AQI moves by FAST_DELTA or more or the category changes, and grows by
+    BACKOFF (up to ``max_minutes``) while readings stay within FLAT_DELTA.
+    Otherwise it drifts back towards the configured base interval.
+
+    Independently of ``adaptive``, a non-zero ``budget`` caps the polling rate
+    so that the points left in the current day or month last until it ends;
+    once they run out, polling pauses until the next period.
+    The cap is worked out afresh on every update and never stored, so the
+    interval comes back down as soon as the budget allows it.
+    """
+
+    FAST_DELTA = 10
+    FLAT_DELTA = 2
+    SPEEDUP = 0.5
+    BACKOFF = 1.5
+
+    def __init__(
+        self,
+        base_minutes: int,
+        adaptive: bool = False,
+        budget: int = 0,
+        period: str = "day",  # "day" or "month"
+        min_minutes: int = 1,
+        max_minutes: int = 60,
+    ) -> None:
+        self.base_minutes = base_minutes
+        self.adaptive = adaptive
+        self.budget = budget
+        self.period = period
+        self.min_minutes = min_minutes
+        self.max_minutes = max_minutes
+
+        self.interval_minutes: float = float(base_minutes)
+        self.cost_per_poll: Optional[float] = None
+        self.spent = 0
+        self._period_start: Optional[datetime] = None
+        self._last_category: Optional[str] = None
+        self._now: Optional[datetime] = None
+
+    @property
+    def interval(self) -> timedelta:
+        return timedelta(minutes=self.effective_minutes)
+
+    @property
+    def effective_minutes(self) -> float:
+        """The base or adaptive interval, stretched as far as the budget requires."""
+        return max(self.interval_minutes, self._budget_floor())
+
+    @property
+    def projected_points(self) -> Optional[int]:
+        """Points expected to be spent over the whole current period."""
+        if self.cost_per_poll is None or self._now is None:
+            return None
+        remaining = (self._period_end() - self._now).total_seconds() / 60
+        return int(round(self.spent + self.cost_per_poll * remaining / self.effective_minutes))
+
+    def set_base(self, minutes: int) -> timedelta:
+        self.base_minutes = minutes
+        self.interval_minutes = float(minutes)
+        return self.interval
+
+    def record(
+        self,
+        result: Optional[PurpleAirResult],
+        points: int,
+        now: Optional[datetime] = None,
+        metadata_points: int = 0,
+    ) -> timedelta:
+        """Account for one update and return the interval until the next poll.
+
+        ``metadata_points`` is the part of ``points`` spent on one-off
+        metadata requests; it counts against the budget but not towards
+        the usual cost of a poll.
+        """
+        self._now = now or datetime.now(timezone.utc)
+        self._roll_period()
+
+        self.spent += points
+        readings = points - metadata_points
+        if readings > 0:
+            # Smooth the per-poll cost; radius and sensor count drift slowly
+            if self.cost_per_poll is None:
+                self.cost_per_poll = float(readings)
+            else:
+                self.cost_per_poll = 0.7 * self.cost_per_poll + 0.3 * readings
+
+        if self.adaptive and result is not None:
+            delta = abs(getattr(result, "_aqi_delta", None) or 0)
+            changed = self._last_category is not None and result.category != self._last_category
+            if changed or delta >= self.FAST_DELTA:
+                self.interval_minutes *= self.SPEEDUP
+            elif delta <= self.FLAT_DELTA:
+                self.interval_minutes *= self.BACKOFF
+            elif self.interval_minutes < self.base_minutes:
+                self.interval_minutes = min(self.interval_minutes * self.BACKOFF, self.base_minutes)
+            else:
+                self.interval_minutes = max(self.interval_minutes * self.SPEEDUP, self.base_minutes)
+            self.interval_minutes = min(max(self.interval_minutes, self.min_minutes), self.max_minutes)
+
+        if result is not None:
+            self._last_category = result.category
+
+        return self.interval
+
+    def _budget_floor(self) -> float:
+        """The shortest interval that keeps this period's spending within budget."""
+        if self.budget <= 0 or self.cost_per_poll is None or self._now is None:
+            return 0.0
+
+        remaining_minutes = (self._period_end() - self._now).total_seconds() / 60
+        polls_left = (self.budget - self.spent) / self.cost_per_poll
+        if polls_left < 1:
+            # Not even one more poll fits: pause until the next period starts
+            return remaining_minutes + 1
+        return remaining_minutes / polls_left
+
+    def _roll_period(self) -> None:
+        start = self._now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.period == "month":
+            start = start.replace(day=1)
+        if start != self._period_start:
+            self._period_start = start
+            self.spent = 0
+
+    def _period_end(self) -> datetime:
+        if self.period == "month":
+            days = calendar.monthrange(self._period_start.year, self._period_start.month)[1]
+            return self._period_start + timedelta(days=days)
+        return self._period_start + timedelta(days=1)
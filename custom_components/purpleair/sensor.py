@@ -1,17 +1,73 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
 from homeassistant.components.sensor import (
     SensorEntity,
     SensorDeviceClass,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from . import DOMAIN
-from .api import PurpleAirResult
+from .api import CONVERSION_FIELDS, PurpleAirResult
+from .aqi import CATEGORIES, category_named
+from .interpolate import zone_slug
+
+
+@dataclass(frozen=True, slots=True)
+class AQISnapshot:
+    """Everything the AQI entities show for one result, worked out once."""
+
+    aqi: int
+    delta: Optional[int]
+    nowcast_aqi: Optional[int]
+    level: Optional[str]
+    category: Optional[str]
+    color: Optional[str]
+    advisory: Optional[str]
+    conversion: str
+    health: str  # "online" or "stale"
+    sites: Optional[str]  # joined for display
+    dropped: Tuple[str, ...]
+    conversions: Mapping[str, int]
+    zones: Mapping[str, int]
+
+    @classmethod
+    def from_result(cls, result: PurpleAirResult) -> "AQISnapshot":
+        category = category_named(result.category)
+        return cls(
+            aqi=result.aqi,
+            delta=getattr(result, "_aqi_delta", None),
+            nowcast_aqi=result.nowcast_aqi,
+            level=str(category.level) if category else None,
+            category=category.name if category else None,
+            color=category.color if category else None,
+            advisory=category.advisory if category else None,
+            conversion=result.conversion,
+            health="stale" if result.stale else "online",
+            sites=", ".join(result.sites) if result.sites else None,
+            dropped=tuple(result.dropped),
+            conversions=MappingProxyType(dict(result.conversions)),
+            zones=MappingProxyType(dict(result.zones)),
+        )
+
+
+def snapshot_of(result: PurpleAirResult | None) -> AQISnapshot | None:
+    """The result's snapshot, built by whichever entity asks first."""
+    if result is None:
+        return None
+    snapshot = getattr(result, "_snapshot", None)
+    if snapshot is None:
+        snapshot = AQISnapshot.from_result(result)
+        result._snapshot = snapshot
+    return snapshot
 
 
 async def async_setup_entry(
@@ -20,21 +76,37 @@ async def async_setup_entry(
     async_add_entities,
 ) -> None:
     coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
-
-    async_add_entities(
-        [
-            PurpleAirAQISensor(coordinator, entry),
-            PurpleAirAQIDeltaSensor(coordinator, entry),
-            PurpleAirAQILevelSensor(coordinator, entry),
-            PurpleAirCategorySensor(coordinator, entry),
-            PurpleAirAQIColorSensor(coordinator, entry),
-            PurpleAirConversionSensor(coordinator, entry),
-            PurpleAirHealthAdvisorySensor(coordinator, entry),
-            PurpleAirHealthStatusSensor(coordinator, entry),
-            PurpleAirSitesSensor(coordinator, entry),
-        ],
-        True,
-    )
+    scheduler = hass.data[DOMAIN][entry.entry_id]["scheduler"]
+    client = hass.data[DOMAIN][entry.entry_id]["client"]
+    config = hass.data[DOMAIN][entry.entry_id]["config"]
+
+    entities = [
+        PurpleAirAQISensor(coordinator, entry),
+        PurpleAirAQIDeltaSensor(coordinator, entry),
+        PurpleAirNowCastAQISensor(coordinator, entry),
+        PurpleAirAQILevelSensor(coordinator, entry),
+        PurpleAirCategorySensor(coordinator, entry),
+        PurpleAirAQIColorSensor(coordinator, entry),
+        PurpleAirConversionSensor(coordinator, entry),
+        PurpleAirHealthAdvisorySensor(coordinator, entry),
+        PurpleAirHealthStatusSensor(coordinator, entry),
+        PurpleAirSitesSensor(coordinator, entry),
+        PurpleAirEffectiveIntervalSensor(coordinator, entry, scheduler),
+        PurpleAirProjectedPointsSensor(coordinator, entry, scheduler),
+        PurpleAirPollDurationSensor(coordinator, entry, client),
+        PurpleAirPayloadSizeSensor(coordinator, entry, client),
+        PurpleAirSensorCountSensor(coordinator, entry, client),
+        PurpleAirPollPointsSensor(coordinator, entry, client),
+    ]
+    if config.all_conversions:
+        entities.extend(
+            PurpleAirConversionAQISensor(coordinator, entry, conversion)
+            for conversion in CONVERSION_FIELDS
+        )
+
+    entities.extend(PurpleAirZoneAQISensor(coordinator, entry, zone[0]) for zone in config.zones)
+
+    async_add_entities(entities, True)
 
 
 class PurpleAirBase(CoordinatorEntity, SensorEntity):
@@ -48,13 +120,26 @@ class PurpleAirBase(CoordinatorEntity, SensorEntity):
     def device_info(self):
         return {
             "identifiers": {(DOMAIN, self.entry.entry_id)},
-            "name": "PurpleAir",
+            "name": self.entry.title,
         }
 
     @property
     def result(self) -> PurpleAirResult | None:
         return self.coordinator.data
 
+    @property
+    def snapshot(self) -> AQISnapshot | None:
+        return snapshot_of(self.coordinator.data)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        # Only write (and so record) state when this entity's own state changed
+        state: Any = (self.available, self.native_value, self.extra_state_attributes)
+        if state == getattr(self, "_written_state", None):
+            return
+        self._written_state = state
+        self.async_write_ha_state()
+
 
 class PurpleAirAQISensor(PurpleAirBase):
     _attr_name = "AQI"
@@ -69,7 +154,7 @@ class PurpleAirAQISensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        return self.result.aqi if self.result else None
+        return self.snapshot.aqi if self.snapshot else None
 
 
 class PurpleAirAQIDeltaSensor(PurpleAirBase):
@@ -86,17 +171,21 @@ class PurpleAirAQIDeltaSensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        return getattr(self.result, "_aqi_delta", None) if self.result else None
+        return self.snapshot.delta if self.snapshot else None
 
 
-CATEGORY_TO_LEVEL = {
-    "Good": 1,
-    "Moderate": 2,
-    "Unhealthy for Sensitive Groups": 3,
-    "Unhealthy": 4,
-    "Very Unhealthy": 5,
-    "Hazardous": 6,
-}
+class PurpleAirNowCastAQISensor(PurpleAirBase):
+    _attr_name = "NowCast AQI"
+    _attr_icon = "mdi:weather-hazy"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_nowcast_aqi"
+
+    @property
+    def native_value(self):
+        return self.snapshot.nowcast_aqi if self.snapshot else None
 
 
 class PurpleAirAQILevelSensor(PurpleAirBase):
@@ -110,16 +199,13 @@ class PurpleAirAQILevelSensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        if not self.result:
-            return None
-        level = CATEGORY_TO_LEVEL.get(self.result.category)
-        return str(level) if level is not None else None
+        return self.snapshot.level if self.snapshot else None
 
 
 class PurpleAirCategorySensor(PurpleAirBase):
     _attr_name = "Category"
     _attr_device_class = SensorDeviceClass.ENUM
-    _attr_options = list(CATEGORY_TO_LEVEL.keys())
+    _attr_options = [category.name for category in CATEGORIES]
 
     @property
     def unique_id(self):
@@ -127,17 +213,7 @@ class PurpleAirCategorySensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        return self.result.category if self.result else None
-
-
-CATEGORY_TO_COLOR = {
-    "Good": "Green",
-    "Moderate": "Yellow",
-    "Unhealthy for Sensitive Groups": "Orange",
-    "Unhealthy": "Red",
-    "Very Unhealthy": "Purple",
-    "Hazardous": "Maroon",
-}
+        return self.snapshot.category if self.snapshot else None
 
 
 class PurpleAirAQIColorSensor(PurpleAirBase):
@@ -151,7 +227,7 @@ class PurpleAirAQIColorSensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        return CATEGORY_TO_COLOR.get(self.result.category) if self.result else None
+        return self.snapshot.color if self.snapshot else None
 
 class PurpleAirConversionSensor(PurpleAirBase):
     _attr_name = "Conversion"
@@ -163,17 +239,48 @@ class PurpleAirConversionSensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        return self.result.conversion if self.result else None
+        return self.snapshot.conversion if self.snapshot else None
+
+
+class PurpleAirConversionAQISensor(PurpleAirBase):
+    """The AQI under one conversion, for side-by-side comparison."""
+
+    _attr_icon = "mdi:flask-outline"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator, entry: ConfigEntry, conversion: str):
+        super().__init__(coordinator, entry)
+        self.conversion = conversion
+        self._attr_name = f"AQI ({conversion})"
+
+    @property
+    def unique_id(self):
+        slug = "".join(c if c.isalnum() else "_" for c in self.conversion.lower())
+        return f"{self.entry.entry_id}_aqi_{slug}"
+
+    @property
+    def native_value(self):
+        return self.snapshot.conversions.get(self.conversion) if self.snapshot else None
+
 
+class PurpleAirZoneAQISensor(PurpleAirBase):
+    """The AQI interpolated at one configured zone."""
 
-ADVISORY_TEXT = {
-    "Good": "Air quality is good. Enjoy your day!",
-    "Moderate": "Sensitive individuals should limit prolonged outdoor exertion.",
-    "Unhealthy for Sensitive Groups": "Reduce prolonged outdoor exertion if sensitive.",
-    "Unhealthy": "Everyone may begin to experience health effects.",
-    "Very Unhealthy": "Health alert: avoid outdoor exertion.",
-    "Hazardous": "Emergency conditions. Stay indoors.",
-}
+    _attr_icon = "mdi:map-marker-radius"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator, entry: ConfigEntry, zone: str):
+        super().__init__(coordinator, entry)
+        self.zone = zone
+        self._attr_name = f"AQI ({zone})"
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_zone_{zone_slug(self.zone)}"
+
+    @property
+    def native_value(self):
+        return self.snapshot.zones.get(self.zone) if self.snapshot else None
 
 
 class PurpleAirHealthAdvisorySensor(PurpleAirBase):
@@ -186,7 +293,7 @@ class PurpleAirHealthAdvisorySensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        return ADVISORY_TEXT.get(self.result.category) if self.result else None
+        return self.snapshot.advisory if self.snapshot else None
 
 
 class PurpleAirHealthStatusSensor(PurpleAirBase):
@@ -199,7 +306,7 @@ class PurpleAirHealthStatusSensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        return "online" if self.result else "offline"
+        return self.snapshot.health if self.snapshot else "offline"
 
 class PurpleAirSitesSensor(PurpleAirBase):
     _attr_name = "Sites"
@@ -211,6 +318,156 @@ class PurpleAirSitesSensor(PurpleAirBase):
 
     @property
     def native_value(self):
-        if not self.result or not self.result.sites:
+        return self.snapshot.sites if self.snapshot else None
+
+    @property
+    def extra_state_attributes(self):
+        if not self.snapshot:
             return None
-        return ", ".join(self.result.sites)
+        return {"dropped": list(self.snapshot.dropped)}
+
+
+class PurpleAirSchedulerBase(PurpleAirBase):
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator, entry: ConfigEntry, scheduler):
+        super().__init__(coordinator, entry)
+        self.scheduler = scheduler
+
+
+class PurpleAirEffectiveIntervalSensor(PurpleAirSchedulerBase):
+    _attr_name = "Effective Update Interval"
+    _attr_icon = "mdi:timer-cog-outline"
+    _attr_native_unit_of_measurement = UnitOfTime.MINUTES
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_effective_interval"
+
+    @property
+    def native_value(self):
+        return round(self.scheduler.effective_minutes, 1)
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "adaptive": self.scheduler.adaptive,
+            "base_interval": self.scheduler.base_minutes,
+        }
+
+
+class PurpleAirProjectedPointsSensor(PurpleAirSchedulerBase):
+    _attr_name = "Projected API Points"
+    _attr_icon = "mdi:counter"
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_projected_points"
+
+    @property
+    def native_value(self):
+        return self.scheduler.projected_points
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "period": self.scheduler.period,
+            "budget": self.scheduler.budget or None,
+            "spent": self.scheduler.spent,
+            "cost_per_poll": (
+                round(self.scheduler.cost_per_poll, 1)
+                if self.scheduler.cost_per_poll is not None
+                else None
+            ),
+        }
+
+
+class PurpleAirPollStatsBase(PurpleAirBase):
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator, entry: ConfigEntry, client):
+        super().__init__(coordinator, entry)
+        self.client = client
+
+    @property
+    def stats(self):
+        return self.client.last_stats
+
+
+class PurpleAirPollDurationSensor(PurpleAirPollStatsBase):
+    _attr_name = "Poll Duration"
+    _attr_icon = "mdi:timer-sand"
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_poll_duration"
+
+    @property
+    def native_value(self):
+        return round(self.stats.total * 1000, 1)
+
+    @property
+    def extra_state_attributes(self):
+        stats = self.stats
+        return {
+            "requests": stats.requests,
+            "dns_ms": round(stats.dns * 1000, 1),
+            "connect_ms": round(stats.connect * 1000, 1),
+            "server_wait_ms": round(stats.server_wait * 1000, 1),
+            "transfer_ms": round(stats.transfer * 1000, 1),
+            "decode_ms": round(stats.decode * 1000, 1),
+            "process_ms": round(stats.process * 1000, 1),
+        }
+
+
+class PurpleAirPayloadSizeSensor(PurpleAirPollStatsBase):
+    _attr_name = "Payload Size"
+    _attr_icon = "mdi:download-network-outline"
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_payload_size"
+
+    @property
+    def native_value(self):
+        return self.stats.bytes
+
+
+class PurpleAirSensorCountSensor(PurpleAirPollStatsBase):
+    _attr_name = "Sensors Used"
+    _attr_icon = "mdi:filter-outline"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_sensors_used"
+
+    @property
+    def native_value(self):
+        return self.stats.rows_used
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "rows_received": self.stats.rows_received,
+            "rows_in_range": self.stats.rows_in_range,
+        }
+
+
+class PurpleAirPollPointsSensor(PurpleAirPollStatsBase):
+    _attr_name = "Poll API Points"
+    _attr_icon = "mdi:cash-fast"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def unique_id(self):
+        return f"{self.entry.entry_id}_poll_points"
+
+    @property
+    def native_value(self):
+        return self.stats.points
@@ -0,0 +1,135 @@
+# custom_components/purpleair/spatial.py
+
+from __future__ import annotations
+
+import heapq
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Grid cell size in degrees (~1.4 miles of latitude)
+CELL_DEG = 0.02
+
+
+def distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    # Haversine, returns miles
+    lat1, lon1 = a
+    lat2, lon2 = b
+    R = 6371000.0
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    aa = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(aa), math.sqrt(1 - aa))
+    d_meters = R * c
+    d_km = d_meters / 1000.0
+    return d_km / 1.609  # miles
+
+
+def distance2degrees(latitude: float) -> Tuple[float, float]:
+    """Return (miles per degree of latitude, miles per degree of longitude)."""
+    lat_miles_per_degree = 68.972
+    lon_miles_per_degree = 69.172 * math.cos(math.radians(latitude))
+    return lat_miles_per_degree, lon_miles_per_degree
+
+
+class SensorGrid:
+    """Uniform lat/lon grid over sensor coordinates.
+
+    Answers exact circular radius queries and "nearest K" queries by only
+    visiting the cells that can contain an answer, instead of measuring the
+    distance to every sensor in the response.
+    """
+
+    def __init__(
+        self, points: Dict[Any, Tuple[float, float]], cell_deg: float = CELL_DEG
+    ) -> None:
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], List[Tuple[Any, float, float]]] = {}
+        for key, (lat, lon) in points.items():
+            self.cells.setdefault(self._cell(lat, lon), []).append((key, lat, lon))
+
+        if self.cells:
+            rows = [c[0] for c in self.cells]
+            cols = [c[1] for c in self.cells]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+        else:
+            self._bounds = (0, -1, 0, -1)
+
+    def __len__(self) -> int:
+        return sum(len(members) for members in self.cells.values())
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def within(self, origin: Tuple[float, float], radius: float) -> Dict[Any, float]:
+        """Return {key: miles} for every point no further than ``radius`` miles."""
+        lat_miles, lon_miles = distance2degrees(origin[0])
+        dlat = radius / lat_miles
+        dlon = radius / max(lon_miles, 1e-6)
+        row_lo, col_lo = self._cell(origin[0] - dlat, origin[1] - dlon)
+        row_hi, col_hi = self._cell(origin[0] + dlat, origin[1] + dlon)
+
+        found: Dict[Any, float] = {}
+        for row in range(max(row_lo, self._bounds[0]), min(row_hi, self._bounds[1]) + 1):
+            for col in range(max(col_lo, self._bounds[2]), min(col_hi, self._bounds[3]) + 1):
+                for key, lat, lon in self.cells.get((row, col), ()):
+                    d = distance(origin, (lat, lon))
+                    if d <= radius:
+                        found[key] = d
+        return found
+
+    def nearest(
+        self,
+        origin: Tuple[float, float],
+        k: int,
+        accept: Optional[Callable[[Any], bool]] = None,
+    ) -> List[Tuple[float, Any]]:
+        """Return up to ``k`` (miles, key) pairs closest to ``origin``.
+
+        Cells are visited in square rings around the origin's cell; the search
+        stops once the k-th best is closer than anything an unvisited ring
+        could hold.
+        """
+        if k <= 0 or not self.cells:
+            return []
+
+        lat_miles, lon_miles = distance2degrees(origin[0])
+        ring_miles = self.cell_deg * max(min(lat_miles, lon_miles), 1e-6)
+        row0, col0 = self._cell(*origin)
+        max_ring = max(
+            abs(row0 - self._bounds[0]),
+            abs(row0 - self._bounds[1]),
+            abs(col0 - self._bounds[2]),
+            abs(col0 - self._bounds[3]),
+        )
+
+        best: List[Tuple[float, Any]] = []  # max-heap via negated distance
+        for ring in range(max_ring + 1):
+            for row, col in _ring_cells(row0, col0, ring):
+                for key, lat, lon in self.cells.get((row, col), ()):
+                    if accept is not None and not accept(key):
+                        continue
+                    d = distance(origin, (lat, lon))
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, key))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, key))
+
+            # Anything in ring+1 or beyond is at least ring * cell away
+            if len(best) == k and -best[0][0] <= ring * ring_miles:
+                break
+
+        return sorted((-neg, key) for neg, key in best)
+
+
+def _ring_cells(row0: int, col0: int, ring: int):
+    if ring == 0:
+        yield (row0, col0)
+        return
+    for col in range(col0 - ring, col0 + ring + 1):
+        yield (row0 - ring, col)
+        yield (row0 + ring, col)
+    for row in range(row0 - ring + 1, row0 + ring):
+        yield (row, col0 - ring)
+        yield (row, col0 + ring)
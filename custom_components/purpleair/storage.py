@@ -0,0 +1,71 @@
+# custom_components/purpleair/storage.py
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from .api import MAX_STALE_SECONDS, PurpleAirClient, PurpleAirResult
+from .nowcast import NowCastHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60  # seconds; coalesces the writes of several updates
+
+_RESULT_FIELDS = {f.name for f in dataclasses.fields(PurpleAirResult)}
+
+
+def snapshot(client: PurpleAirClient) -> Dict[str, Any]:
+    """What a restart needs to come back without asking the API first.
+
+    The last good result (with the wall-clock time it was fetched), the
+    feed's sensor metadata and the NowCast history.
+    """
+    result = client.last_good
+    metadata = client.feed.metadata
+    with client.history.lock:
+        nowcast = client.history.as_dict()
+    return {
+        "result": dataclasses.asdict(result) if result else None,
+        "result_at": time.time() - client.last_good_age if result else None,
+        "metadata": {**metadata.payload(), "refreshed_at": metadata.refreshed_at},
+        "nowcast": nowcast,
+    }
+
+
+def restore(client: PurpleAirClient, data: Optional[Dict[str, Any]]) -> Optional[PurpleAirResult]:
+    """Load a snapshot() into ``client``.
+
+    Returns the cached result, marked stale, when it is recent enough to
+    show until the first refresh completes; otherwise None.
+    """
+    if not data:
+        return None
+
+    try:
+        metadata = data.get("metadata")
+        if metadata and metadata.get("data") and not client.feed.metadata.sensors:
+            client.feed.metadata.merge(metadata)
+            client.feed.metadata.refreshed_at = float(metadata.get("refreshed_at") or 0.0)
+        if data.get("nowcast"):
+            client.history = NowCastHistory.from_dict(data["nowcast"])
+    except (KeyError, TypeError, ValueError) as err:
+        _LOGGER.debug("Ignoring unreadable PurpleAir cache: %s", err)
+
+    cached = data.get("result")
+    result_at = data.get("result_at")
+    if not cached or result_at is None:
+        return None
+    age = max(time.time() - float(result_at), 0.0)
+    if age > MAX_STALE_SECONDS:
+        return None
+    try:
+        result = PurpleAirResult(**{k: v for k, v in cached.items() if k in _RESULT_FIELDS})
+    except TypeError:
+        return None
+    result.stale = True
+    client.restore_last_good(result, age)
+    return result
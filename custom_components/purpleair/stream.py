@@ -0,0 +1,191 @@
+# custom_components/purpleair/stream.py
+
+from __future__ import annotations
+
+import codecs
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+_WS = " \t\n\r"
+_DECODER = json.JSONDecoder()
+
+# Drop consumed text from the buffer once this much has piled up
+_COMPACT_AT = 64 * 1024
+
+RowFilter = Callable[[Dict[str, int], List[Any]], bool]
+
+
+class _NeedMore(Exception):
+    """The buffer ends in the middle of a token."""
+
+
+class SensorStreamParser:
+    """Incremental parser for a /v1/sensors response body.
+
+    Feed it bytes as they arrive.  Top-level members (``fields``,
+    ``time_stamp``, ...) are decoded normally; rows of ``data`` are decoded
+    one at a time and handed to ``keep`` together with the field index, so
+    rows that can never be used are dropped immediately.  Only the kept rows,
+    the ``sensor_index`` of dropped ones and the text of the row currently
+    being received are held in memory.
+    """
+
+    def __init__(self, keep: Optional[RowFilter] = None) -> None:
+        self._keep = keep
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+        self._field_index: Optional[Dict[str, int]] = None
+        self._pending: List[List[Any]] = []  # rows seen before "fields"
+        self.payload: Dict[str, Any] = {}
+        self.rows: List[List[Any]] = []
+        self.dropped: List[Any] = []
+        self.row_count = 0
+        self.size = 0  # bytes fed so far
+        self.elapsed = 0.0  # seconds spent parsing so far
+
+    def feed(self, chunk: bytes) -> None:
+        start = time.perf_counter()
+        self.size += len(chunk)
+        self._buf += self._decoder.decode(chunk)
+        self._parse(final=False)
+        self.elapsed += time.perf_counter() - start
+
+    def close(self) -> Dict[str, Any]:
+        self._buf += self._decoder.decode(b"", final=True)
+        self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Truncated PurpleAir response")
+
+        for row in self._pending:
+            self._row(row)
+        self.payload["data"] = self.rows
+        self.payload["dropped"] = self.dropped
+        self.payload["row_count"] = self.row_count
+        return self.payload
+
+    # -- tokenizer -------------------------------------------------------
+
+    def _skip_ws(self) -> None:
+        buf, pos = self._buf, self._pos
+        while pos < len(buf) and buf[pos] in _WS:
+            pos += 1
+        self._pos = pos
+        if pos >= len(buf):
+            raise _NeedMore
+
+    def _expect(self, chars: str) -> str:
+        self._skip_ws()
+        char = self._buf[self._pos]
+        if char not in chars:
+            raise ValueError(f"Unexpected {char!r} in PurpleAir response")
+        self._pos += 1
+        return char
+
+    def _value(self, final: bool) -> Any:
+        self._skip_ws()
+        try:
+            value, end = _DECODER.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError as err:
+            if final:
+                raise ValueError(f"Malformed PurpleAir response: {err}") from err
+            raise _NeedMore from err
+        # A number at the very end of the buffer may still be growing
+        if end >= len(self._buf) and not final:
+            raise _NeedMore
+        self._pos = end
+        return value
+
+    # -- grammar ---------------------------------------------------------
+
+    def _parse(self, final: bool) -> None:
+        while self._state != "done":
+            mark = self._pos
+            try:
+                self._step(final)
+            except _NeedMore:
+                self._pos = mark
+                break
+        if self._pos >= _COMPACT_AT:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+    def _step(self, final: bool) -> None:
+        state = self._state
+        if state == "start":
+            self._expect("{")
+            self._state = "key"
+        elif state == "key":
+            self._skip_ws()
+            if self._buf[self._pos] == "}":
+                self._pos += 1
+                self._state = "done"
+                return
+            key = self._value(final)
+            self._expect(":")
+            self._key = key
+            if key == "data":
+                self._expect("[")
+                self._state = "row"
+            else:
+                self._state = "value"
+        elif state == "value":
+            value = self._value(final)
+            self.payload[self._key] = value
+            if self._key == "fields":
+                self._field_index = {name: idx for idx, name in enumerate(value)}
+            self._state = "next"
+        elif state == "next":
+            if self._expect(",}") == "}":
+                self._state = "done"
+            else:
+                self._state = "key"
+        elif state == "row":
+            self._skip_ws()
+            if self._buf[self._pos] == "]":
+                self._pos += 1
+                self._state = "next"
+                return
+            row = self._value(final)
+            if self._field_index is None:
+                self._pending.append(row)
+            else:
+                self._row(row)
+            self._state = "row_sep"
+        elif state == "row_sep":
+            if self._expect(",]") == "]":
+                self._state = "next"
+            elif self._field_index is not None:
+                self._rows()
+            else:
+                self._state = "row"
+
+    def _rows(self) -> None:
+        """Fast path through a run of ``[...], [...],`` rows."""
+        buf, pos, end = self._buf, self._pos, len(self._buf)
+        # scan_once fails with a cheap StopIteration instead of a JSONDecodeError
+        scan = _DECODER.scan_once
+        while True:
+            while pos < end and buf[pos] in _WS:
+                pos += 1
+            try:
+                row, after = scan(buf, pos)
+            except (StopIteration, json.JSONDecodeError):
+                break
+            if after >= end or buf[after] != ",":
+                break
+            self._row(row)
+            pos = after + 1
+        self._pos = pos
+        self._state = "row"
+
+    def _row(self, row: List[Any]) -> None:
+        self.row_count += 1
+        field_index = self._field_index or {}
+        if self._keep is None or self._keep(field_index, row):
+            self.rows.append(row)
+        elif "sensor_index" in field_index:
+            self.dropped.append(row[field_index["sensor_index"]])
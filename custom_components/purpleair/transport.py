@@ -0,0 +1,134 @@
+# custom_components/purpleair/transport.py
+
+from __future__ import annotations
+
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Optional
+
+import aiohttp
+
+try:  # aiohttp only decodes brotli when one of these is installed
+    import brotli  # noqa: F401
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_KEEPALIVE = 120.0  # seconds an idle connection is kept open
+DEFAULT_DNS_TTL = 600  # seconds
+
+
+@dataclass
+class RequestTiming:
+    """Wall-clock breakdown of one HTTP request, in seconds.
+
+    ``dns`` and ``connect`` (TCP + TLS) are None when a pooled connection was
+    reused.  ``ttfb`` runs from sending the request to receiving headers.
+    """
+
+    total: float = 0.0
+    dns: Optional[float] = None
+    connect: Optional[float] = None
+    ttfb: Optional[float] = None
+    reused: bool = False
+    encoding: Optional[str] = None  # Content-Encoding of the response
+
+
+class PurpleAirTransport:
+    """HTTP transport shared by every PurpleAir feed.
+
+    Wraps either Home Assistant's shared client session or a dedicated
+    pooled, keep-alive session with DNS caching.  Requests advertise
+    gzip/brotli compression.  Each request is timed into the ``timing``
+    keyword (a RequestTiming); phase timings need a dedicated session,
+    since trace hooks cannot be added to Home Assistant's shared one.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, owns_session: bool = False) -> None:
+        self._session = session
+        self._owns_session = owns_session
+
+    @classmethod
+    def dedicated(
+        cls,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keepalive: float = DEFAULT_KEEPALIVE,
+        dns_ttl: int = DEFAULT_DNS_TTL,
+        ssl_context: Any = True,
+    ) -> "PurpleAirTransport":
+        connector = aiohttp.TCPConnector(
+            limit=pool_size,
+            limit_per_host=pool_size,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=dns_ttl,
+            ssl=ssl_context,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector, trace_configs=[_trace_config()]
+        )
+        return cls(session, owns_session=True)
+
+    @asynccontextmanager
+    async def get(self, url: str, **kwargs: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        headers = {"Accept-Encoding": ACCEPT_ENCODING, **(kwargs.pop("headers", None) or {})}
+        timing = kwargs.pop("timing", None) or RequestTiming()
+        trace = SimpleNamespace(timing=timing, marks={})
+        start = time.monotonic()
+        try:
+            async with self._session.get(
+                url, headers=headers, trace_request_ctx=trace, **kwargs
+            ) as resp:
+                timing.encoding = resp.headers.get("Content-Encoding")
+                yield resp
+        finally:
+            timing.total = time.monotonic() - start
+
+    async def close(self) -> None:
+        if self._owns_session:
+            await self._session.close()
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    def ctx(params_ctx: Any) -> Optional[SimpleNamespace]:
+        trace = params_ctx.trace_request_ctx
+        return trace if isinstance(trace, SimpleNamespace) else None
+
+    def mark(name: str):
+        async def handler(session, params_ctx, params) -> None:
+            trace = ctx(params_ctx)
+            if trace is not None:
+                trace.marks[name] = time.monotonic()
+
+        return handler
+
+    def span(start: str, attr: str):
+        async def handler(session, params_ctx, params) -> None:
+            trace = ctx(params_ctx)
+            if trace is not None and start in trace.marks:
+                setattr(trace.timing, attr, time.monotonic() - trace.marks[start])
+
+        return handler
+
+    async def reused(session, params_ctx, params) -> None:
+        trace = ctx(params_ctx)
+        if trace is not None:
+            trace.timing.reused = True
+
+    config = aiohttp.TraceConfig()
+    config.on_dns_resolvehost_start.append(mark("dns"))
+    config.on_dns_resolvehost_end.append(span("dns", "dns"))
+    config.on_connection_create_start.append(mark("connect"))
+    config.on_connection_create_end.append(span("connect", "connect"))
+    config.on_connection_reuseconn.append(reused)
+    config.on_request_headers_sent.append(mark("sent"))
+    config.on_request_end.append(span("sent", "ttfb"))
+    return config
@@ -0,0 +1,25 @@
+"""Helpers shared by the tests: a stand-in HTTP server on localhost."""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+Handler = Callable[[web.Request], web.StreamResponse]
+
+
+@asynccontextmanager
+async def stand_in_server(routes: Dict[str, Handler]) -> AsyncIterator[str]:
+    """Serve ``routes`` (path -> GET handler) on a free port; yields the base URL."""
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    server = TestServer(app, host="127.0.0.1")
+    await server.start_server()
+    try:
+        yield str(server.make_url("")).rstrip("/")
+    finally:
+        await server.close()
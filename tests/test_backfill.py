@@ -0,0 +1,188 @@
+"""PurpleAirBackfill against a stand-in history endpoint."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+import pytest
+from aiohttp import web
+
+from custom_components.purpleair import backfill
+from custom_components.purpleair.api import PurpleAirClient, PurpleAirConfig
+from custom_components.purpleair.backfill import (
+    MAX_SPAN,
+    HistoryCSVParser,
+    HistoryStore,
+    PurpleAirBackfill,
+)
+from custom_components.purpleair.transport import PurpleAirTransport
+
+from .common import stand_in_server
+
+HISTORY_PATH = "/v1/sensors/{index}/history/csv"
+
+
+class HistoryEndpoint:
+    """Hourly CSV rows for any window; chosen requests can be made to fail."""
+
+    def __init__(self) -> None:
+        self.calls: List[Tuple[int, int, int, Dict[str, str]]] = []
+        self.fail: Set[Tuple[int, int]] = set()  # (sensor, nth request) answered with a 500
+        self.active = 0
+        self.peak = 0
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        index = int(request.match_info["index"])
+        start = int(request.query["start_timestamp"])
+        end = int(request.query["end_timestamp"])
+        self.calls.append((index, start, end, dict(request.query)))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            nth = sum(1 for call in self.calls if call[0] == index)
+            if (index, nth) in self.fail:
+                return web.Response(status=500, text="boom")
+
+            fields = request.query["fields"].split(",")
+            resp = web.StreamResponse()
+            resp.content_type = "text/csv"
+            await resp.prepare(request)
+            await resp.write((",".join(["time_stamp", "sensor_index", *fields]) + "\n").encode())
+            for stamp in range(-(-start // 3600) * 3600, end, 3600):
+                values = [str(10 + (stamp // 3600) % 24) for _ in fields]
+                await resp.write((",".join([str(stamp), str(index), *values]) + "\n").encode())
+            return resp
+        finally:
+            self.active -= 1
+
+
+def make_client(transport: PurpleAirTransport, now: float) -> PurpleAirClient:
+    config = PurpleAirConfig(
+        api_key="key",
+        device_search=False,
+        search_coords=None,
+        search_range=1,
+        unit="miles",
+        weighted=False,
+        sensor_index=None,
+        read_key=None,
+        conversion="none",
+        update_interval=10,
+        sensors=((11, "RK"), (12, None)),
+    )
+    client = PurpleAirClient(transport, config)
+    for key in (11, 12, "lan-device"):
+        client.history.add(key, 10.0, now)
+    return client
+
+
+async def run_backfill(
+    tmp_path, endpoint: HistoryEndpoint, days: int, runs: int = 1
+) -> Dict[str, Any]:
+    routes = {HISTORY_PATH.format(index="{index}"): endpoint.handle}
+    async with stand_in_server(routes) as base:
+        transport = PurpleAirTransport.dedicated()
+        store = HistoryStore(str(tmp_path / "history.db"))
+        try:
+            job = PurpleAirBackfill(transport, "key", store, days, url=base + HISTORY_PATH)
+            client = make_client(transport, time.time())
+            rows = [await job.async_run(client) for _ in range(runs)]
+            return {
+                "rows": rows,
+                "summary": store.summary(),
+                "covered": store.covered("pm2.5_atm"),
+                "client": client,
+            }
+        finally:
+            store.close()
+            await transport.close()
+
+
+def test_backfill_fetches_every_window_once(tmp_path) -> None:
+    endpoint = HistoryEndpoint()
+    result = asyncio.run(run_backfill(tmp_path, endpoint, days=30))
+
+    # 30 days of complete hours for both cloud sensors; the LAN key is skipped
+    assert result["summary"]["sensors"] == 2
+    assert result["rows"][0] == result["summary"]["rows"]
+    assert 2 * 29 * 24 <= result["summary"]["rows"] <= 2 * 30 * 24
+    assert {call[0] for call in endpoint.calls} == {11, 12}
+
+    for sensor in (11, 12):
+        windows = [(start, end) for index, start, end, _ in endpoint.calls if index == sensor]
+        assert len(windows) == 3
+        assert windows == sorted(windows)
+        assert all(end - start <= MAX_SPAN for start, end in windows)
+        assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+        assert windows[-1][1] % 3600 == 0  # only complete hours
+        assert result["covered"][sensor] == windows[-1][1]
+
+    queries = {call[0]: call[3] for call in endpoint.calls}
+    assert queries[11]["read_key"] == "RK"
+    assert "read_key" not in queries[12]
+    assert queries[11]["fields"] == "pm2.5_atm,humidity"
+
+
+def test_backfill_seeds_nowcast(tmp_path) -> None:
+    endpoint = HistoryEndpoint()
+    result = asyncio.run(run_backfill(tmp_path, endpoint, days=1))
+
+    client = result["client"]
+    now = time.time()
+    hourly = client.history.hourly(11, now)
+    assert sum(value is not None for value in hourly) >= 11
+    assert client.history.nowcast(11, now) is not None
+
+
+def test_backfill_rerun_requests_nothing_new(tmp_path) -> None:
+    endpoint = HistoryEndpoint()
+    result = asyncio.run(run_backfill(tmp_path, endpoint, days=3, runs=2))
+
+    assert result["rows"][1] == 0
+    # Unless the hour turned between the two runs, the second one is free
+    assert len(endpoint.calls) <= 4
+
+
+def test_backfill_resumes_from_failed_window(tmp_path) -> None:
+    endpoint = HistoryEndpoint()
+    endpoint.fail = {(11, 2)}  # sensor 11's second window
+
+    first = asyncio.run(run_backfill(tmp_path, endpoint, days=30))
+    first_windows = [call[1:3] for call in endpoint.calls if call[0] == 11]
+    # The failure ended sensor 11's run: its third window was never asked for
+    assert len(first_windows) == 2
+    assert first["covered"][11] == first_windows[0][1]
+    assert len([call for call in endpoint.calls if call[0] == 12]) == 3
+
+    endpoint.calls.clear()
+    endpoint.fail = set()
+    second = asyncio.run(run_backfill(tmp_path, endpoint, days=30))
+    retried = [call[1:3] for call in endpoint.calls if call[0] == 11]
+    assert retried[0] == first_windows[1]
+    assert second["covered"][11] == retried[-1][1]
+    assert second["covered"][11] % 3600 == 0
+
+
+def test_backfill_bounds_parallel_requests(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(backfill, "MAX_PARALLEL", 1)
+    endpoint = HistoryEndpoint()
+    asyncio.run(run_backfill(tmp_path, endpoint, days=3))
+    assert endpoint.peak == 1
+
+
+@pytest.mark.parametrize(
+    ("line", "expected"),
+    [
+        (b"1700000000,11,12.5,40\n", (11, 1700000000, 12.5, None, 40.0)),
+        (b"1700003600,11,,40\n", (11, 1700003600, None, None, 40.0)),
+        (b",11,12.5,40\n", None),
+        (b"1700000000,11\n", None),
+    ],
+)
+def test_history_csv_parser(line: bytes, expected) -> None:
+    parser = HistoryCSVParser(11)
+    assert parser.feed_line(b"time_stamp,sensor_index,pm2.5_atm,humidity\n") is None
+    assert parser.feed_line(line) == expected
@@ -0,0 +1,181 @@
+"""PurpleAirLanFeed against stand-in device servers."""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List
+
+import pytest
+from aiohttp import web
+
+from custom_components.purpleair import lan
+from custom_components.purpleair.api import PurpleAirClient, PurpleAirConfig
+from custom_components.purpleair.lan import PurpleAirLanFeed, device_row
+from custom_components.purpleair.resilience import PurpleAirError
+from custom_components.purpleair.transport import PurpleAirTransport
+
+from .common import stand_in_server
+
+
+class Device:
+    """One PurpleAir unit's /json endpoint."""
+
+    def __init__(self, number: int, pm25: float = 10.0) -> None:
+        self.reading: Dict[str, Any] = {
+            "SensorId": f"84:f3:eb:00:00:{number:02x}",
+            "Geo": f"PurpleAir-{number}",
+            "lat": 37.77 + number * 0.001,
+            "lon": -122.41,
+            "pm2_5_atm": pm25,
+            "pm2_5_atm_b": pm25 + 1,
+            "pm2_5_cf_1": pm25 * 1.1,
+            "pm2_5_cf_1_b": (pm25 + 1) * 1.1,
+            "current_humidity": 45,
+        }
+        self.status = 200
+        self.delay = 0.0
+        self.requests = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status, text="unavailable")
+        return web.json_response(self.reading)
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def serve(stack: AsyncExitStack, devices: List[Device]) -> List[str]:
+    hosts = []
+    for device in devices:
+        base = await stack.enter_async_context(stand_in_server({"/json": device.handle}))
+        hosts.append(base.split("://", 1)[1])
+    return hosts
+
+
+def make_client(transport: PurpleAirTransport, hosts: List[str]) -> PurpleAirClient:
+    config = PurpleAirConfig(
+        api_key="key",
+        device_search=True,
+        search_coords=(37.77, -122.41),
+        search_range=5,
+        unit="miles",
+        weighted=True,
+        sensor_index=None,
+        read_key=None,
+        conversion="none",
+        update_interval=1,
+        local_hosts=tuple(hosts),
+    )
+    return PurpleAirClient(transport, config)
+
+
+def test_lan_poll_skips_failed_devices(monkeypatch) -> None:
+    monkeypatch.setattr(lan, "DEVICE_TIMEOUT", 0.3)
+    devices = [Device(1, 10.0), Device(2, 20.0), Device(3), Device(4)]
+    devices[2].status = 500
+    devices[3].delay = 1.0  # slower than DEVICE_TIMEOUT
+
+    async def scenario():
+        async with AsyncExitStack() as stack:
+            hosts = await serve(stack, devices)
+            unreachable = f"127.0.0.1:{closed_port()}"
+            transport = PurpleAirTransport.dedicated()
+            stack.push_async_callback(transport.close)
+            client = make_client(transport, [*hosts, unreachable])
+            result = await client.fetch()
+            return client, result, hosts, unreachable
+
+    client, result, hosts, unreachable = asyncio.run(scenario())
+
+    assert isinstance(client.feed, PurpleAirLanFeed)
+    assert sorted(result.sites) == ["PurpleAir-1", "PurpleAir-2"]
+    # Between the AQIs of the two devices' channel means, 10.5 and 20.5 µg/m³
+    assert 44 <= result.aqi <= 69
+    assert sorted(client.feed.failed) == sorted([hosts[2], hosts[3], unreachable])
+    assert client.last_stats.requests == 2
+    assert client.last_points == 0
+
+
+def test_lan_poll_fails_when_no_device_answers() -> None:
+    device = Device(1)
+    device.status = 503
+
+    async def scenario():
+        async with AsyncExitStack() as stack:
+            hosts = await serve(stack, [device])
+            transport = PurpleAirTransport.dedicated()
+            stack.push_async_callback(transport.close)
+            feed = PurpleAirLanFeed(transport, hosts)
+            with pytest.raises(PurpleAirError):
+                await feed.async_fetch()
+            return feed
+
+    feed = asyncio.run(scenario())
+    assert feed.failed == feed.hosts
+    assert feed.breaker.failures == 1
+
+
+def test_lan_concurrent_fetches_share_one_poll() -> None:
+    device = Device(1)
+    device.delay = 0.1
+
+    async def scenario():
+        async with AsyncExitStack() as stack:
+            hosts = await serve(stack, [device])
+            transport = PurpleAirTransport.dedicated()
+            stack.push_async_callback(transport.close)
+            feed = PurpleAirLanFeed(transport, hosts)
+            heard = []
+            feed.add_listener(lambda payload, requester: heard.append(requester))
+            payloads = await asyncio.gather(feed.async_fetch("a"), feed.async_fetch("b"))
+            return payloads, heard
+
+    payloads, heard = asyncio.run(scenario())
+    assert device.requests == 1
+    assert payloads[0] is payloads[1]
+    assert heard == ["a"]
+
+
+def test_lan_metadata_version_only_moves_on_change() -> None:
+    devices = [Device(1), Device(2)]
+
+    async def scenario():
+        async with AsyncExitStack() as stack:
+            hosts = await serve(stack, devices)
+            transport = PurpleAirTransport.dedicated()
+            stack.push_async_callback(transport.close)
+            feed = PurpleAirLanFeed(transport, hosts)
+            versions = []
+            for poll in range(4):
+                if poll == 3:
+                    devices[1].reading["lat"] += 0.01  # the unit was moved
+                await feed.async_fetch()
+                versions.append(feed.metadata.version)
+            return feed, versions
+
+    feed, versions = asyncio.run(scenario())
+    assert versions[0] == versions[1] == versions[2]
+    assert versions[3] == versions[2] + 1
+    moved = feed.metadata.get(devices[1].reading["SensorId"])
+    assert moved.latitude == pytest.approx(devices[1].reading["lat"])
+
+
+@pytest.mark.parametrize(
+    ("a", "b", "confidence"),
+    [(10.0, 11.0, 100), (10.0, 40.0, 0), (None, 12.0, 100)],
+)
+def test_device_row_confidence(a, b, confidence) -> None:
+    row, meta = device_row(
+        {"SensorId": "84:f3:eb:00:00:01", "pm2_5_atm": a, "pm2_5_atm_b": b}, "10.0.0.5"
+    )
+    assert row[0] == meta[0] == "84:f3:eb:00:00:01"
+    assert row[1] == confidence
+    assert meta[1] == "10.0.0.5"  # no Geo name: the host stands in